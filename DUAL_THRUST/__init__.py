@@ -1,11 +1,18 @@
-from jesse.strategies import Strategy, cached
+from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
-import numpy as np
+
+from shared.cache import bar_cached
+from shared.profiling import profiled
+from shared.rolling import RollingMax, RollingMin
+from shared.sparse import Candidates
+from shared.streaming import get_state
+from shared.timeframes import StreamingResampler
 
 # https://medium.com/@gaea.enquiries/quantitative-strategy-research-series-one-the-dual-thrust-38380b38c2fa
 # Dual Thrust by Michael Chalek
 
+@profiled
 class DUAL_THRUST(Strategy):
 
     def should_long(self) -> bool:
@@ -40,66 +47,90 @@ class DUAL_THRUST(Strategy):
     ################################################################
 
     @property
+    @bar_cached
     def up_min_low(self):
-        return np.min(self.candles[:, 4][-self.hp['up_length']:])
+        return get_state(self, RollingMin, self.hp['up_length'], 'low').update(self.candles)
 
     @property
+    @bar_cached
     def up_min_close(self):
-        return np.min(self.candles[:, 2][-self.hp['up_length']:])
+        return get_state(self, RollingMin, self.hp['up_length'], 'close').update(self.candles)
 
     @property
+    @bar_cached
     def up_max_close(self):
-        return np.max(self.candles[:, 2][-self.hp['up_length']:])
+        return get_state(self, RollingMax, self.hp['up_length'], 'close').update(self.candles)
 
     @property
+    @bar_cached
     def up_max_high(self):
-        return np.max(self.candles[:, 3][-self.hp['up_length']:])
+        return get_state(self, RollingMax, self.hp['up_length'], 'high').update(self.candles)
 
     @property
+    @bar_cached
     def down_min_low(self):
-        return np.min(self.candles[:, 4][-self.hp['down_length']:])
+        return get_state(self, RollingMin, self.hp['down_length'], 'low').update(self.candles)
 
     @property
+    @bar_cached
     def down_min_close(self):
-        return np.min(self.candles[:, 2][-self.hp['down_length']:])
+        return get_state(self, RollingMin, self.hp['down_length'], 'close').update(self.candles)
 
     @property
+    @bar_cached
     def down_max_close(self):
-        return np.max(self.candles[:, 2][-self.hp['down_length']:])
+        return get_state(self, RollingMax, self.hp['down_length'], 'close').update(self.candles)
 
     @property
+    @bar_cached
     def down_max_high(self):
-        return np.max(self.candles[:, 4][-self.hp['down_length']:])
+        return get_state(self, RollingMax, self.hp['down_length'], 'low').update(self.candles)
 
     @property
+    @bar_cached
     def up_thurst(self):
-        return self.anchor_candles[:, 1][-1] + self.hp['up_coeff'] * max(self.up_max_close - self.up_min_low, self.up_max_high - self.up_min_close)
+        return self.anchor_candle.open + self.hp['up_coeff'] * max(self.up_max_close - self.up_min_low, self.up_max_high - self.up_min_close)
 
     @property
+    @bar_cached
     def down_thrust(self):
-        return self.anchor_candles[:, 1][-1] - self.hp['down_coeff'] * max(self.down_max_close - self.down_min_low, self.down_max_high - self.down_min_close)
+        return self.anchor_candle.open - self.hp['down_coeff'] * max(self.down_max_close - self.down_min_low, self.down_max_high - self.down_min_close)
 
     @property
-    @cached
-    def anchor_candles(self):
-        return self.get_candles(self.exchange, self.symbol, utils.anchor_timeframe(self.timeframe))
+    @bar_cached
+    def anchor_candle(self):
+        # forming candle of the anchor timeframe, built from the candles of the trading timeframe
+        return get_state(self, StreamingResampler, utils.anchor_timeframe(self.timeframe)).update(self.candles)
 
     @property
+    @bar_cached
     def short_cond(self):
         return self.price < self.down_thrust
 
     @property
+    @bar_cached
     def long_cond(self):
         return self.price > self.up_thurst
 
     @property
+    @bar_cached
     def atr(self):
         return ta.atr(self.candles)
 
 
+    @staticmethod
+    def candidate_bars(candles, timeframe, hp):
+        # Candles where long_cond or short_cond is true, the only ones where the
+        # strategy can enter or exit (see shared/sparse.py)
+        from .population import conditions
+        long_cond, short_cond = conditions(candles, timeframe, [hp])
+        any_cond = long_cond[0] | short_cond[0]
+        return Candidates(entry=any_cond, exit=any_cond)
+
     # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     # Genetic
     # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # population.py evaluates a whole population of these at once
 
     def hyperparameters(self):
         return [
@@ -0,0 +1,223 @@
+"""
+Evaluates a whole population of DUAL_THRUST hyperparameters in one pass.
+
+The genetic optimizer backtests each individual separately, recomputing the
+same rolling highs and lows for every one of them. Here the rolling min/max
+of close, high and low are indexed once (see RangeExtremes in
+shared/vectorized.py), the thrust levels and entry conditions of all the
+individuals are computed as (individuals x candles) arrays, and each
+individual's trades are simulated by jumping from signal to signal.
+
+The simulation follows the strategy's rules:
+ - enter at the close when price crosses the up (long) or down (short) thrust,
+   risking 2% of the balance with a stop at stop_loss_atr_rate * ATR(14)
+ - liquidate at the close when the opposite condition fires, and reverse on
+   the same candle
+ - the stop is filled at its price on the first candle whose low (long) or
+   high (short) reaches it. Jesse fills stops on one minute candles, so
+   results can differ slightly when a candle gaps through the stop.
+
+Example:
+    from strategies.DUAL_THRUST.population import evaluate_population
+    results = evaluate_population(candles, '1h', [{'up_length': 21, ...}, ...], start=240)
+
+`evaluate_population_parallel` splits the population between worker
+processes that share one copy of the candles (see shared/workers.py), and
+`halving_search` uses it for a successive halving search (see
+shared/halving.py) that only evaluates the best candidates on the whole
+history.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import jesse.indicators as ta
+from jesse import utils
+
+from shared import halving
+from shared.vectorized import RangeExtremes, forming_candle_open
+from shared.workers import SharedCandles
+
+MAX_LENGTH = 30
+
+
+class ThrustRanges:
+    """
+    The thrust range of DUAL_THRUST for every candle and any length up to
+    MAX_LENGTH, computed once per length and shared by all individuals.
+    """
+
+    def __init__(self, candles):
+        self.close = RangeExtremes(candles[:, 2], MAX_LENGTH)
+        self.high = RangeExtremes(candles[:, 3], MAX_LENGTH)
+        self.low = RangeExtremes(candles[:, 4], MAX_LENGTH)
+        self.cache = {}
+
+    def up(self, length):
+        key = ('up', length)
+        if key not in self.cache:
+            self.cache[key] = np.maximum(
+                self.close.max(length) - self.low.min(length),
+                self.high.max(length) - self.close.min(length),
+            )
+        return self.cache[key]
+
+    def down(self, length):
+        key = ('down', length)
+        if key not in self.cache:
+            # same as DUAL_THRUST.down_max_high, which reads the low column
+            self.cache[key] = np.maximum(
+                self.close.max(length) - self.low.min(length),
+                self.low.max(length) - self.close.min(length),
+            )
+        return self.cache[key]
+
+
+def conditions(candles, timeframe, population, ranges=None):
+    """
+    long_cond and short_cond of every individual at every candle, as two
+    (individuals x candles) boolean arrays.
+    """
+    ranges = ranges or ThrustRanges(candles)
+    anchor_open = forming_candle_open(candles, utils.anchor_timeframe(timeframe))
+    up_coeff = np.array([hp['up_coeff'] for hp in population])[:, None]
+    down_coeff = np.array([hp['down_coeff'] for hp in population])[:, None]
+    up_range = np.stack([ranges.up(hp['up_length']) for hp in population])
+    down_range = np.stack([ranges.down(hp['down_length']) for hp in population])
+
+    close = candles[:, 2]
+    long_cond = close > anchor_open + up_coeff * up_range
+    short_cond = close < anchor_open - down_coeff * down_range
+    return long_cond, short_cond
+
+
+def simulate(candles, long_cond, short_cond, atr, stop_loss_atr_rate, start=0, starting_balance=10_000,
+             fee_rate=0):
+    """
+    Trades of a single individual. Returns a dict with the trades, the net
+    profit, the number of trades and the win rate.
+    """
+    close, high, low = candles[:, 2], candles[:, 3], candles[:, 4]
+    entries = np.flatnonzero(long_cond | short_cond)
+    long_exits = np.flatnonzero(short_cond)
+    short_exits = np.flatnonzero(long_cond)
+    last = len(candles) - 1
+
+    trades = []
+    balance = float(starting_balance)
+    i = start
+    while True:
+        k = np.searchsorted(entries, i)
+        if k == len(entries):
+            break
+        entry_index = entries[k]
+        side = 1 if long_cond[entry_index] else -1
+        entry_price = close[entry_index]
+        stop = entry_price - side * atr[entry_index] * stop_loss_atr_rate
+        qty = utils.risk_to_qty(balance, 2, entry_price, stop)
+
+        exits = long_exits if side == 1 else short_exits
+        k = np.searchsorted(exits, entry_index + 1)
+        exit_index = exits[k] if k < len(exits) else last
+        # the stop can fill on any candle up to (and including) the exit candle
+        window = slice(entry_index + 1, exit_index + 1)
+        stopped = np.flatnonzero(low[window] <= stop if side == 1 else high[window] >= stop)
+        # no exit at all: the position is closed because we reached the end of the candles
+        reached_end = k == len(exits) and not len(stopped)
+        if len(stopped):
+            exit_index = entry_index + 1 + stopped[0]
+            exit_price = stop
+        else:
+            exit_price = close[exit_index]
+
+        fee = fee_rate * qty * (entry_price + exit_price)
+        pnl = side * qty * (exit_price - entry_price) - fee
+        balance += pnl
+        trades.append({
+            'type': 'long' if side == 1 else 'short',
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'qty': qty,
+            'entry_index': int(entry_index),
+            'exit_index': int(exit_index),
+            'fee': fee,
+            'PNL': pnl,
+        })
+
+        if reached_end:
+            break
+        # a new position can be opened on the candle the previous one was closed
+        i = exit_index
+
+    wins = sum(1 for t in trades if t['PNL'] > 0)
+    return {
+        'trades': trades,
+        'net_profit': balance - starting_balance,
+        'total': len(trades),
+        'win_rate': wins / len(trades) if trades else 0,
+    }
+
+
+def evaluate_population(candles, timeframe, population, start=0, starting_balance=10_000, fee_rate=0):
+    """
+    Evaluates every hyperparameter dict of `population` over `candles` (the
+    candles of the trading timeframe, warmup candles included, trading from
+    index `start`). Returns one result dict (see `simulate`) per individual,
+    with its hyperparameters under 'hp'.
+    """
+    long_cond, short_cond = conditions(candles, timeframe, population)
+    atr = ta.atr(candles, sequential=True)
+
+    results = []
+    for n, hp in enumerate(population):
+        result = simulate(candles, long_cond[n], short_cond[n], atr, hp['stop_loss_atr_rate'],
+                          start=start, starting_balance=starting_balance, fee_rate=fee_rate)
+        result['hp'] = hp
+        results.append(result)
+    return results
+
+
+def _evaluate_chunk(candles, timeframe, population, kwargs):
+    return evaluate_population(candles.array, timeframe, population, **kwargs)
+
+
+def evaluate_population_parallel(candles, timeframe, population, max_workers=None, mp_context=None, **kwargs):
+    """
+    Same as `evaluate_population`, with the population split between
+    `max_workers` processes. `candles` is copied once into shared memory;
+    it can also be a SharedCandles handle (e.g. of a .npy file) that is
+    already shared.
+    """
+    if not population:
+        return []
+    max_workers = max_workers or os.cpu_count()
+    shared = candles if isinstance(candles, SharedCandles) else SharedCandles.create(candles)
+    size = math.ceil(len(population) / max_workers)
+    chunks = [population[i:i + size] for i in range(0, len(population), size)]
+    try:
+        with ProcessPoolExecutor(max_workers, mp_context=mp_context) as pool:
+            futures = [pool.submit(_evaluate_chunk, shared, timeframe, chunk, kwargs) for chunk in chunks]
+            return [result for future in futures for result in future.result()]
+    finally:
+        if shared is not candles:
+            shared.release()
+
+
+def halving_search(candles, timeframe, population, start=0, rungs=4, eta=3, max_workers=None, mp_context=None,
+                   **kwargs):
+    """
+    Successive halving of `population` (see shared/halving.py) over windows
+    of the last candles of `candles`, each with the `start` candles before
+    it as warmup. The candidates of every rung are evaluated in parallel
+    with `evaluate_population_parallel`, ranked by net profit.
+    """
+    total = len(candles) - start
+
+    def evaluate(survivors, length):
+        window = candles[len(candles) - length - start:]
+        return evaluate_population_parallel(window, timeframe, survivors, max_workers=max_workers,
+                                            mp_context=mp_context, start=start, **kwargs)
+
+    return halving.successive_halving(population, evaluate, halving.lengths(total, rungs, eta), eta)
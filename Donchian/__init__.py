@@ -6,20 +6,41 @@ when price closes above the upperband and only exit the position when
 prices closes below the lowerband.
 """
 
+import numpy as np
 from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
 
+from shared.cache import bar_cached
+from shared.lookback import trimmed
+from shared.profiling import profiled
+from shared.rolling import StreamingDonchian
+from shared.screener import Screen, sma
+from shared.sparse import Candidates
+from shared.streaming import get_state
+from shared.vectorized import previous, signals
 
+
+@profiled
 class Donchian(Strategy):
+    def lookbacks(self):
+        # candles each indicator needs (see shared/lookback.py)
+        return {'ma_trend': 200}
+
     @property
+    @bar_cached
     def donchian(self):
-        # Previous Donchian Channels with default parameters
-        return ta.donchian(self.candles[:-1])
+        # Previous Donchian Channels with default parameters: the channel at the
+        # previous candle comes with the update of the current one
+        state = get_state(self, StreamingDonchian, 20)
+        state.update(self.candles)
+        return state.value
 
     @property
-    def ma_trend(self):
-        return ta.sma(self.candles, period=200)
+    @bar_cached
+    @trimmed
+    def ma_trend(self, candles):
+        return ta.sma(candles, period=200)
 
     def filter_trend(self):
         # Only opens a long position when close is above 200 SMA
@@ -50,3 +71,28 @@ class Donchian(Strategy):
         # Close the position when candle closes below lowerband
         if self.close < self.donchian.lowerband:
             self.liquidate()
+
+    @staticmethod
+    def vectorized_signals(candles):
+        # The rules above evaluated for every candle at once (see shared/vectorized.py)
+        close = candles[:, 2]
+        donchian = ta.donchian(candles, sequential=True)
+        ma_trend = ta.sma(candles, period=200, sequential=True)
+        long_entry = (close > previous(donchian.upperband)) & (close > ma_trend)
+        return signals(long_entry=long_entry, long_exit=close < previous(donchian.lowerband))
+
+    @staticmethod
+    def candidate_bars(candles, timeframe, hp):
+        # Candles where the rules above can act (see shared/sparse.py); the trend filter is left to the strategy
+        close = candles[:, 2]
+        donchian = ta.donchian(candles, sequential=True)
+        return Candidates(entry=close > previous(donchian.upperband), exit=close < previous(donchian.lowerband))
+
+    @staticmethod
+    def screen_signals(candles):
+        # should_long() and the trend filter at the last candle of every symbol at once (see shared/screener.py)
+        close, high = candles[:, :, 2], candles[:, :, 3]
+        upperband = np.max(high[:, -21:-1], axis=1)
+        long = (close[:, -1] > upperband) & (close[:, -1] > sma(close, 200))
+        return Screen(long=long, short=np.zeros_like(long))
+
@@ -15,26 +15,38 @@ from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
 
+from shared.cache import bar_cached
+from shared.filters import ordered_filters
+from shared.ichimoku import StreamingIchimoku
+from shared.profiling import profiled
+from shared.streaming import get_state
+from shared.wilder import StreamingRSI
 
+
+@profiled
 class IFR2(Strategy):
     @property
+    @bar_cached
     def rsi(self):
-        return ta.rsi(self.candles, period=2)
+        return get_state(self, StreamingRSI, 2).update(self.candles)
 
     @property
+    @bar_cached
     def trend_mode(self):
         return ta.ht_trendmode(self.candles)
 
     @property
+    @bar_cached
     def ichimoku(self):
         # Ichimoku cloud using parameters adapted to crypto market
-        return ta.ichimoku_cloud(
-            self.candles,
-            conversion_line_period=20,
-            base_line_period=30,
-            lagging_line_period=120,
-            displacement=60,
-        )
+        return get_state(
+            self,
+            StreamingIchimoku,
+            20,  # conversion_line_period
+            30,  # base_line_period
+            120,  # lagging_line_period
+            60,  # displacement
+        ).update(self.candles)
 
     def filter_trend_ichimoku(self):
         # Only opens a long position when close is above ichimoku cloud
@@ -45,7 +57,8 @@ class IFR2(Strategy):
         return self.trend_mode == 1
 
     def filters(self):
-        return [self.filter_trend_ichimoku, self.filter_trend_mode]
+        # Cheapest and most selective filter first
+        return ordered_filters(self, [self.filter_trend_ichimoku, self.filter_trend_mode])
 
     def should_long(self) -> bool:
         # Go long if candle RSI2 is below 10
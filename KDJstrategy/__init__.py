@@ -12,18 +12,33 @@ from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
 
+from shared.cache import bar_cached
+from shared.profiling import profiled
+from shared.stochastic import StreamingKDJ
+from shared.streaming import get_state
 
+
+@profiled
 class KDJstrategy(Strategy):
 
+    @property
+    @bar_cached
+    def kdj(self):
+        # (previous, current) KDJ with default parameters, updated one candle at a time
+        state = get_state(self, StreamingKDJ)
+        current = state.update(self.candles)
+        return state.value, current
+
     @property
     def KDJIndicator(self): #KDJ Indicator
-        return ta.kdj(self.candles) #returns namedtuple KDJ(k,d,j) with default parameters
+        return self.kdj[1] #returns namedtuple KDJ(k,d,j) of the current candle
 
     @property
     def LastKDJ(self):
-        return ta.kdj(self.candles[:-1]) #returns the previous candles KDJ values
+        return self.kdj[0] #returns the previous candles KDJ values
 
     @property
+    @bar_cached
     def atr(self):
         return ta.atr(self.candles, period = 14) #14 period ATR used for calculating stop loss
 
@@ -6,6 +6,15 @@ When the MACD line crosses the signal line AND the closing price of the last can
 the 100 period EMA a long order is placed. The script has been seet up to use the built in 
 optimization, but the optimization was never completed due to lack of processing power. 
 Change the default values in the hyperparameters function to manually tune parameters.
+grid.py searches the whole hyperparameter space with the vectorized rules on all CPU cores.
+MACD and EMA are streamed (updated one candle at a time from shared/ema.py) instead of recomputed
+over the whole candle history every bar. Set `StreamingIndicator.verify = True` (shared/streaming.py)
+to check every value against the batch jesse indicators over the whole history.
+This changes the trades: the non sequential ta.ema/ta.macd calls this replaced only saw the last 240
+candles, so their EMAs restarted from a seed 240 candles back, which with a long `ema` still weighs a
+lot (about 9% for ema=200). The streamed values use the whole history, so entries and exits differ from
+that version, a little with the default ema=100 and much more with the longer ones. verify() compares
+with the full history values, not with the 240 candle ones.
 """
 
 """
@@ -15,20 +24,29 @@ version     = "1.0"
 email       = "connormcd98@gmail.com"
 """
 
-from jesse.strategies import Strategy, cached
+from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
 
+from shared.cache import bar_cached
+from shared.ema import StreamingEMA, StreamingMACD
+from shared.profiling import profiled
+from shared.streaming import get_state
+from shared.vectorized import signals
 
 
+
+@profiled
 class MACD_EMA(Strategy):
     @property
+    @bar_cached
     def macd(self): #this returns: macd, signal and hist which can be referenced as self.macd[0], self.macd[1] and self.macd[2], respectively
-        return ta.macd(self.candles, self.hp['fastperiod'],self.hp['slowperiod'],self.hp['signalperiod'])
+        return get_state(self, StreamingMACD, self.hp['fastperiod'],self.hp['slowperiod'],self.hp['signalperiod']).update(self.candles)
 
     @property
+    @bar_cached
     def ema(self): #this returns a single value which is the 100EMA at the latest candle
-        return ta.ema(self.candles, self.hp['ema'])
+        return get_state(self, StreamingEMA, self.hp['ema']).update(self.candles)
 
     def should_long(self):
         # return true if close is above EMA and MACD line is above signal line
@@ -57,7 +75,17 @@ class MACD_EMA(Strategy):
         if self.macd[0] < self.macd[1] and self.close < self.ema:
             self.liquidate()
 
-
+    @staticmethod
+    def rules(close, ema, macd, signal):
+        # The rules above for every candle at once, given the indicator series (see grid.py)
+        long_entry = (close > ema) & (macd > signal)
+        return signals(long_entry=long_entry, long_exit=(macd < signal) & (close < ema))
+
+    @staticmethod
+    def vectorized_signals(candles, ema=100, fastperiod=12, slowperiod=26, signalperiod=9):
+        # (see shared/vectorized.py)
+        macd = ta.macd(candles, fastperiod, slowperiod, signalperiod, sequential=True)
+        return MACD_EMA.rules(candles[:, 2], ta.ema(candles, ema, sequential=True), macd.macd, macd.signal)
 
     def hyperparameters(self): # This is set up for optimization but if you just want to backtest with your own values then change the default value only.
         return [
@@ -0,0 +1,205 @@
+"""
+Grid (or random) search over MACD_EMA's hyperparameters.
+
+The whole space (ema 50..200, fastperiod 10..18, slowperiod 19..36,
+signalperiod 3..9) is about 171k trials, which is too much for one backtest
+per trial but not for the vectorized rules of the strategy (see
+shared/vectorized.py): every trial is the strategy's `rules` over indicator
+series plus a simulation that jumps from signal to signal.
+
+The trials are grouped by MACD periods, one task per group, and the tasks are
+handed to a process pool: an idle worker takes the next task from the queue,
+so a slow task never holds up the others. Each worker keeps the EMA series it
+computed, so the ema periods that come up in every task are computed once per
+worker. The candles are shared between the workers (see shared/workers.py).
+
+Every result is appended to a JSON lines file as soon as its task is done,
+and the trials already in the file are skipped when the search is run again,
+so an interrupted search picks up where it stopped.
+
+Usage, from the root of the Jesse project:
+    python -m strategies.MACD_EMA.grid --candles storage/BTC-USDT-1h.npy --output storage/grid/MACD_EMA.jsonl
+    python -m strategies.MACD_EMA.grid --candles storage/BTC-USDT-1h.npy --trials 5000
+
+or from Python:
+    from strategies.MACD_EMA.grid import search
+    search(candles, 'storage/grid/MACD_EMA.jsonl', start=240)
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import jesse.indicators as ta
+
+from shared.candle_store import load_candles
+from shared.hyperparameters import declared
+from shared.vectorized import simulate
+from shared.workers import SharedCandles
+
+from . import MACD_EMA
+
+NAMES = ('ema', 'fastperiod', 'slowperiod', 'signalperiod')
+
+# EMA series of the worker, by candles (SharedCandles key) and period
+_emas = {}
+
+
+def space():
+    """
+    Every hyperparameters dict of the strategy's search space.
+    """
+    ranges = [range(hp['min'], hp['max'] + 1) for hp in declared(MACD_EMA)]
+    return [dict(zip(NAMES, values)) for values in itertools.product(*ranges)]
+
+
+def key(hp):
+    return tuple(hp[name] for name in NAMES)
+
+
+def _ema(shared, period):
+    """
+    EMA of the shared candles, computed once per worker. Series of other
+    candles (an earlier search in the same process) are dropped.
+    """
+    dataset = shared.key, shared.shape
+    if _emas and next(iter(_emas))[0] != dataset:
+        _emas.clear()
+    if (dataset, period) not in _emas:
+        _emas[dataset, period] = ta.ema(shared.array, period, sequential=True)
+    return _emas[dataset, period]
+
+
+def _evaluate(candles, trials, start, starting_balance, fee_rate):
+    """
+    Results of trials that share the same MACD periods.
+    """
+    shared, candles = candles, candles.array
+    first = trials[0]
+    macd = ta.macd(candles, first['fastperiod'], first['slowperiod'], first['signalperiod'], sequential=True)
+    close = candles[:, 2]
+
+    results = []
+    for hp in trials:
+        signals = MACD_EMA.rules(close, _ema(shared, hp['ema']), macd.macd, macd.signal)
+        result = simulate(candles, signals, start=start, starting_balance=starting_balance, fee_rate=fee_rate)
+        wins = sum(1 for t in result['trades'] if t['PNL'] > 0)
+        results.append({
+            'hp': hp,
+            'net_profit': result['net_profit'],
+            'total': result['total'],
+            'win_rate': wins / result['total'] if result['total'] else 0,
+        })
+    return results
+
+
+def saved(output):
+    """
+    Results saved in `output`. A line cut short by a crash is ignored.
+    """
+    if not os.path.exists(output):
+        return
+    with open(output) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(result, dict) and 'hp' in result:
+                yield result
+
+
+def done(output):
+    """
+    Keys of the trials already saved in `output`.
+    """
+    keys = set()
+    for result in saved(output):
+        try:
+            keys.add(key(result['hp']))
+        except KeyError:
+            continue
+    return keys
+
+
+def _end_line(output):
+    """
+    Ends the last line of `output` when a crash cut it short, so new results start on their own line.
+    """
+    if os.path.exists(output) and os.path.getsize(output):
+        with open(output, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+
+def search(candles, output, start=0, trials=None, seed=0, starting_balance=10_000, fee_rate=0, max_workers=None,
+           mp_context=None):
+    """
+    Evaluates the whole space, or `trials` random hyperparameters of it, over
+    `candles` (warmup candles included, trading from index `start`) and
+    appends one JSON line per trial to `output`. Returns the number of
+    trials evaluated by this call.
+    """
+    population = space()
+    if trials is not None:
+        population = random.Random(seed).sample(population, min(trials, len(population)))
+    skip = done(output)
+    groups = defaultdict(list)
+    for hp in population:
+        if key(hp) not in skip:
+            groups[(hp['fastperiod'], hp['slowperiod'], hp['signalperiod'])].append(hp)
+    if not groups:
+        return 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    _end_line(output)
+    shared = candles if isinstance(candles, SharedCandles) else SharedCandles.create(candles)
+    count = 0
+    try:
+        with ProcessPoolExecutor(max_workers, mp_context=mp_context) as pool, open(output, 'a') as f:
+            futures = [pool.submit(_evaluate, shared, group, start, starting_balance, fee_rate)
+                       for group in groups.values()]
+            for future in as_completed(futures):
+                results = future.result()
+                for result in results:
+                    f.write(json.dumps(result) + '\n')
+                f.flush()
+                count += len(results)
+    finally:
+        if shared is not candles:
+            shared.release()
+    return count
+
+
+def best(output, n=10, metric='net_profit'):
+    """
+    The `n` best results saved in `output`.
+    """
+    return sorted(saved(output), key=lambda r: r[metric], reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid or random search over MACD_EMA's hyperparameters.")
+    parser.add_argument('--candles', required=True, help='.npy or .csv candles of the trading timeframe, warmup included')
+    parser.add_argument('--output', default='storage/grid/MACD_EMA.jsonl')
+    parser.add_argument('--warmup', type=int, default=240, help='number of warmup candles')
+    parser.add_argument('--trials', type=int, help='number of random trials instead of the whole grid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--fee-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    count = search(load_candles(args.candles), args.output, start=args.warmup, trials=args.trials, seed=args.seed,
+                   fee_rate=args.fee_rate, max_workers=args.workers)
+    print(f'{count} trials saved to {args.output}')
+    for result in best(args.output):
+        print(f"{result['net_profit']:>14.2f} {result['total']:>6} {result['win_rate']:>7.1%}  {result['hp']}")
+
+
+if __name__ == '__main__':
+    main()
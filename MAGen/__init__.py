@@ -2,6 +2,14 @@ import jesse.indicators as ta
 from jesse import utils
 from jesse.strategies import Strategy
 
+from shared import trial_cache
+from shared.cache import bar_cached
+from shared.profiling import profiled
+from shared.streaming import get_state
+from shared.trial_cache import cached_series
+from shared.wilder import StreamingADX, StreamingATR
+
+@profiled
 class MAGen(Strategy):
 
     def should_long(self) -> bool:
@@ -40,26 +48,35 @@ class MAGen(Strategy):
     ################################################################
 
     @property
+    @bar_cached
     def longEntry(self):
         return self.trend_direction_change == 1 and self.adx > self.hp['adx_entry']
 
     @property
+    @bar_cached
     def shortEntry(self):
         return self.trend_direction_change == -1 and self.adx > self.hp['adx_entry']
 
     @property
+    @bar_cached
     def longExit(self):
         return self.ma_fast[-1] < self.ma_slow[-1] and self.adx < self.hp['adx_exit']
 
     @property
+    @bar_cached
     def shortExit(self):
         return self.ma_fast[-1] > self.ma_slow[-1] and self.adx < self.hp['adx_exit']
 
     @property
+    @bar_cached
     def adx(self):
-        return ta.adx(self.candles, period=self.hp['adx_period'])
+        # Wilder's smoothing over the whole history. The non sequential `ta.adx(self.candles, ...)` this replaced
+        # only saw the last 240 candles, which with a long adx_period (up to 60) is far from converged: the values
+        # differ enough to flip the adx_entry/adx_exit gates, so entries and exits can differ from that version.
+        return get_state(self, StreamingADX, self.hp['adx_period']).update(self.candles)
 
     @property
+    @bar_cached
     def trend_direction_change(self):
         direction = 0
         if self.ma_fast[-1] < self.ma_slow[-1] and self.ma_fast[-2] >= self.ma_slow[-2]:
@@ -70,6 +87,7 @@ class MAGen(Strategy):
 
 
     @property
+    @bar_cached
     def ma_slow(self):
         if self.hp['ma_source_slow'] == 0:
             source = "close"
@@ -86,9 +104,13 @@ class MAGen(Strategy):
         elif self.hp['ma_source_slow'] == 6:
             source = "ohlc4"
 
-        return ta.ma(self.candles, matype=self.hp['ma_type_slow'], period=self.hp['ma_period_slow'], source_type=source, sequential=True)
+        matype, period = self.hp['ma_type_slow'], self.hp['ma_period_slow']
+        # shared with the other trials of the optimization worker that use the same MA
+        return cached_series(self, 'ma', (matype, period, source), lambda candles: ta.ma(
+            candles, matype=matype, period=period, source_type=source, sequential=True))
 
     @property
+    @bar_cached
     def ma_fast(self):
 
         if self.hp['ma_source_fast'] == 0:
@@ -106,15 +128,34 @@ class MAGen(Strategy):
         elif self.hp['ma_source_fast'] == 6:
             source = "ohlc4"
 
-        return ta.ma(self.candles, matype=self.hp['ma_type_fast'], period=self.hp['ma_period_fast'], source_type=source, sequential=True)
+        matype, period = self.hp['ma_type_fast'], self.hp['ma_period_fast']
+        # shared with the other trials of the optimization worker that use the same MA
+        return cached_series(self, 'ma', (matype, period, source), lambda candles: ta.ma(
+            candles, matype=matype, period=period, source_type=source, sequential=True))
 
     @property
+    @bar_cached
     def atr(self):
-        return ta.atr(self.candles, period=self.hp['atr_period'])
+        # over the whole history too, which moves the stop and take profit prices slightly
+        return get_state(self, StreamingATR, self.hp['atr_period']).update(self.candles)
+
+    def terminate(self):
+        # saves the moving averages this backtest computed, if the cache has a directory
+        trial_cache.flush()
 
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     # # Genetic
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    @staticmethod
+    def canonical_hp(hp):
+        # hwma (28), vwap (29) and mwdx (32) have no period, so trials that only differ by it are
+        # the same backtest (see shared/run_cache.py)
+        hp = dict(hp)
+        for side in ('slow', 'fast'):
+            if hp.get(f'ma_type_{side}') in (28, 29, 32):
+                hp[f'ma_period_{side}'] = None
+        return hp
+
     def hyperparameters(self):
         return [
             {'name': 'stop_loss_atr_rate', 'type': float, 'min': 1, 'max': 4, 'default': 2},
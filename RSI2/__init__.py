@@ -12,27 +12,49 @@ from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
 
+from shared import screener
+from shared.cache import bar_cached
+from shared.lookback import trimmed
+from shared.profiling import profiled
+from shared.streaming import get_state
+from shared.wilder import StreamingRSI
+
+@profiled
 class RSI2(Strategy):
+    # settings of the strategy, also the defaults of screen_signals
+    VARS = {
+        "fast_sma_period": 5,
+        "slow_sma_period": 200,
+        "rsi_period": 2,
+        "rsi_ob_threshold": 90,
+        "rsi_os_threshold": 10,
+    }
+
     def __init__(self):
         super().__init__()
 
-        self.vars["fast_sma_period"] = 5
-        self.vars["slow_sma_period"] = 200
-        self.vars["rsi_period"] = 2
-        self.vars["rsi_ob_threshold"] = 90
-        self.vars["rsi_os_threshold"] = 10
+        self.vars.update(self.VARS)
+
+    def lookbacks(self):
+        # candles each indicator needs (see shared/lookback.py)
+        return {'fast_sma': self.vars["fast_sma_period"], 'slow_sma': self.vars["slow_sma_period"]}
 
     @property
-    def fast_sma(self):
-        return ta.sma(self.candles, self.vars["fast_sma_period"])
+    @bar_cached
+    @trimmed
+    def fast_sma(self, candles):
+        return ta.sma(candles, self.vars["fast_sma_period"])
 
     @property
-    def slow_sma(self):
-        return ta.sma(self.candles, self.vars["slow_sma_period"])
+    @bar_cached
+    @trimmed
+    def slow_sma(self, candles):
+        return ta.sma(candles, self.vars["slow_sma_period"])
 
     @property
+    @bar_cached
     def rsi(self):
-        return ta.rsi(self.candles, self.vars["rsi_period"])
+        return get_state(self, StreamingRSI, self.vars["rsi_period"]).update(self.candles)
 
     def should_long(self) -> bool:
         # Enter long if current price is above sma(200) and RSI(2) is below oversold threshold
@@ -42,6 +64,15 @@ class RSI2(Strategy):
         # Enter long if current price is below sma(200) and RSI(2) is above oversold threshold
         return self.price < self.slow_sma and self.rsi >= self.vars["rsi_ob_threshold"]
 
+    @staticmethod
+    def screen_signals(candles, slow_sma_period=VARS["slow_sma_period"], rsi_period=VARS["rsi_period"],
+                       rsi_ob_threshold=VARS["rsi_ob_threshold"], rsi_os_threshold=VARS["rsi_os_threshold"]):
+        # should_long() and should_short() at the last candle of every symbol at once (see shared/screener.py)
+        close = candles[:, :, 2]
+        price, slow_sma, rsi = close[:, -1], screener.sma(close, slow_sma_period), screener.rsi(close, rsi_period)
+        return screener.Screen(long=(price > slow_sma) & (rsi <= rsi_os_threshold),
+                               short=(price < slow_sma) & (rsi >= rsi_ob_threshold))
+
     def should_cancel_entry(self) -> bool:
         return False
 
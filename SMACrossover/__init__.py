@@ -9,14 +9,28 @@ from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
 
+from shared.cache import bar_cached
+from shared.lookback import trimmed
+from shared.profiling import profiled
+from shared.vectorized import signals
+
+@profiled
 class SMACrossover(Strategy):
+    def lookbacks(self):
+        # candles each indicator needs (see shared/lookback.py)
+        return {'slow_sma': 200, 'fast_sma': 50}
+
     @property
-    def slow_sma(self):
-        return ta.sma(self.candles, 200)
+    @bar_cached
+    @trimmed
+    def slow_sma(self, candles):
+        return ta.sma(candles, 200)
 
     @property
-    def fast_sma(self):
-        return ta.sma(self.candles, 50)
+    @bar_cached
+    @trimmed
+    def fast_sma(self, candles):
+        return ta.sma(candles, 50)
 
     def should_long(self) -> bool:
         # Golden Cross (reference: https://www.investopedia.com/terms/g/goldencross.asp)
@@ -50,3 +64,12 @@ class SMACrossover(Strategy):
     
         if self.is_short and self.fast_sma > self.slow_sma:
             self.liquidate()
+
+    @staticmethod
+    def vectorized_signals(candles):
+        # The rules above evaluated for every candle at once (see shared/vectorized.py)
+        fast_sma = ta.sma(candles, 50, sequential=True)
+        slow_sma = ta.sma(candles, 200, sequential=True)
+        golden_cross = fast_sma > slow_sma
+        death_cross = fast_sma < slow_sma
+        return signals(long_entry=golden_cross, long_exit=death_cross, short_entry=death_cross, short_exit=golden_cross)
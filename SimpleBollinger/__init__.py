@@ -12,16 +12,26 @@ from jesse.strategies import Strategy
 import jesse.indicators as ta
 from jesse import utils
 
+from shared.bollinger import StreamingBollingerBands
+from shared.cache import bar_cached
+from shared.ichimoku import StreamingIchimoku
+from shared.profiling import profiled
+from shared.streaming import get_state
+from shared.vectorized import ichimoku_spans, signals
 
+
+@profiled
 class SimpleBollinger(Strategy):
     @property
+    @bar_cached
     def bb(self):
-        # Bollinger bands using default parameters and hl2 as source
-        return ta.bollinger_bands(self.candles, source_type="hl2")
+        # Bollinger bands using default parameters and hl2 as source, updated one candle at a time
+        return get_state(self, StreamingBollingerBands, 20, 2, 2, "hl2").update(self.candles)
 
     @property
+    @bar_cached
     def ichimoku(self):
-        return ta.ichimoku_cloud(self.candles)
+        return get_state(self, StreamingIchimoku).update(self.candles)
 
     def filter_trend(self):
         # Only opens a long position when close is above ichimoku cloud
@@ -51,4 +61,13 @@ class SimpleBollinger(Strategy):
     def update_position(self):
         # Close the position when candle closes below middleband
         if self.close < self.bb[1]:
-            self.liquidate()
\ No newline at end of file
+            self.liquidate()
+
+    @staticmethod
+    def vectorized_signals(candles):
+        # The rules above evaluated for every candle at once (see shared/vectorized.py)
+        close = candles[:, 2]
+        bb = ta.bollinger_bands(candles, source_type="hl2", sequential=True)
+        span_a, span_b = ichimoku_spans(candles)
+        long_entry = (close > bb[0]) & (close > span_a) & (close > span_b)
+        return signals(long_entry=long_entry, long_exit=close < bb[1])
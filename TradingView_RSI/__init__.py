@@ -8,9 +8,15 @@ Emergency Exit: RSI crosses under 10
 """
 
 from jesse.strategies import Strategy
-import jesse.indicators as ta
 from jesse import utils
+import numpy as np
 
+from shared.cache import bar_cached
+from shared.profiling import profiled
+from shared.streaming import get_state
+from shared.wilder import StreamingRSI
+
+@profiled
 class TradingView_RSI(Strategy):
 
     def hyperparameters(self):
@@ -22,8 +28,12 @@ class TradingView_RSI(Strategy):
         ]
 
     @property
+    @bar_cached
     def rsi(self):
-        return ta.rsi(self.candles, self.hp['rsi'], sequential=True)
+        # RSI of the previous and the current candle, which is all utils.crossed() needs
+        state = get_state(self, StreamingRSI, self.hp['rsi'])
+        current = state.update(self.candles)
+        return np.array([state.value, current])
 
 
     def should_long(self):
@@ -18,13 +18,36 @@ This Python module attempts to implement the system on Jesse framework as descri
 
 Reference: - Faith, C. (2003). The Original Turtle Rules. Retrieved 14 June 2020, from http://www.tradingblox.com/originalturtles/originalturtlerules.htm
            - Kaufman, P. (2013). Trading systems and methods (5th ed., pp. 229-233). Hoboken, N.J.: Wiley.
+
+kernel.py runs the same rules as a single compiled loop (Numba) over precomputed channels and ATR, to sweep
+the parameters over many markets without the event-driven engine.
 """
 
+import numpy as np
 from jesse.strategies import Strategy
-from jesse.indicators import donchian, atr
-from jesse import utils
+from jesse.indicators import atr, donchian
+
+from shared.cache import bar_cached
+from shared.profiling import profiled
+from shared.rolling import StreamingDonchian
+from shared.screener import Screen
+from shared.sparse import Candidates
+from shared.streaming import get_state
 
+@profiled
 class TurtleRules(Strategy):
+    # settings of the strategy, also the defaults of candidate_bars and screen_signals
+    VARS = {
+        "unit_risk_percent": 1,
+        "entry_dc_period": 20,
+        "exit_dc_period": 10,
+        "atr_period": 20,
+        "atr_multiplier": 2,
+        "maximum_pyramiding_levels": 4,
+        "pyramiding_threshold": 0.5,
+        "system_type": "S1",
+    }
+
     def __init__(self):
         super().__init__()
 
@@ -33,24 +56,20 @@ class TurtleRules(Strategy):
         self.last_was_profitable = False
 
     def before(self):
-        self.vars["unit_risk_percent"] = 1
-        self.vars["entry_dc_period"] = 20
-        self.vars["exit_dc_period"] = 10
-        self.vars["atr_period"] = 20
-        self.vars["atr_multiplier"] = 2
-        self.vars["maximum_pyramiding_levels"] = 4
-        self.vars["pyramiding_threshold"] = 0.5
-        self.vars["system_type"] = "S1"
+        self.vars.update(self.VARS)
 
     @property
+    @bar_cached
     def entry_donchian(self):
-        return donchian(self.candles, self.vars["entry_dc_period"])
+        return get_state(self, StreamingDonchian, self.vars["entry_dc_period"]).update(self.candles)
 
     @property
+    @bar_cached
     def exit_donchian(self):
-        return donchian(self.candles, self.vars["exit_dc_period"])
+        return get_state(self, StreamingDonchian, self.vars["exit_dc_period"]).update(self.candles)
 
     @property
+    @bar_cached
     def atr(self):
         return atr(self.candles, self.vars["atr_period"])
 
@@ -60,6 +79,7 @@ class TurtleRules(Strategy):
         
         return ((unit_risk_percent/100) * self.balance) / (self.atr * dollars_per_point)
 
+    @bar_cached
     def entry_signal(self):
         # "The Turtles used two related system entries, each based on Donchian’s channel breakout system.
         #     ...
@@ -76,6 +96,7 @@ class TurtleRules(Strategy):
         
         return signal
 
+    @bar_cached
     def exit_signal(self):
         # "The System 1 exit was a 10 day low for long positions and a 10 day high for short positions. 
         #   All the Units in the position would be exited if the price went against the position for a 10 day breakout.
@@ -178,3 +199,20 @@ class TurtleRules(Strategy):
             self.last_was_profitable = False
             return False
         return True
+
+    @staticmethod
+    def candidate_bars(candles, timeframe, hp, entry_dc_period=VARS["entry_dc_period"]):
+        # Candles where a position can be opened (see shared/sparse.py). Pyramiding depends on
+        # the price of the last unit, so update_position runs on every candle of a position.
+        channel = donchian(candles, entry_dc_period, sequential=True)
+        entry = (candles[:, 3] >= channel.upperband) | (candles[:, 4] <= channel.lowerband)
+        return Candidates(entry=entry, exit=np.ones(len(candles), dtype=bool))
+
+    @staticmethod
+    def screen_signals(candles, entry_dc_period=VARS["entry_dc_period"]):
+        # entry_signal() at the last candle of every symbol at once (see shared/screener.py),
+        # without the S1 filter which depends on the previous trade
+        high, low = candles[:, :, 3], candles[:, :, 4]
+        long = high[:, -1] >= np.max(high[:, -entry_dc_period:], axis=1)
+        short = ~long & (low[:, -1] <= np.min(low[:, -entry_dc_period:], axis=1))
+        return Screen(long=long, short=short)
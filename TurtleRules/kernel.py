@@ -0,0 +1,237 @@
+"""
+Compiled backend for TurtleRules.
+
+The strategy carries state from candle to candle (pyramiding level, price of
+the last unit, stop of the whole position), so it cannot be expressed as
+vectorized signals like Donchian or SMACrossover. Instead the whole rule set
+runs as one loop over precomputed Donchian channels and ATR, compiled with
+Numba's `@njit` when Numba is installed (it runs as plain Python otherwise):
+
+ - entry on a breakout of the `entry_dc_period` channel (the high reaching its
+   upper band for a long, the low reaching its lower band for a short),
+   sized to risk `unit_risk_percent` of the balance per ATR, with a stop at
+   `atr_multiplier` ATR
+ - a new unit every `pyramiding_threshold` ATR in favour of the last one, up
+   to `maximum_pyramiding_levels`, moving the stop of the whole position to
+   `atr_multiplier` ATR from the newest unit
+ - exit on a breakout of the `exit_dc_period` channel against the position or
+   of the entry channel the other way, or at the stop
+
+It follows the class as driven by the engine of shared/benchmark.py (orders
+at the close, stops at their price or at the open when the candle gaps
+through them), including its quirks: the pyramiding level only goes back to
+zero when update_position closes the position (not after a stop), and it is
+counted by go_long/go_short even when the S1 filter rejects the entry. The
+class' S1 filter never rejects anything because Jesse never calls
+on_take_profit for it; `s1_filter=True` applies the rule as written instead
+(skip the next entry after a winning trade). As in a Jesse backtest, a
+position still open on the last candle is closed at its close, so the
+trades and net profit line up with `jesse.research.backtest` (the engine of
+shared/benchmark.py leaves it open).
+
+Usage:
+    from strategies.TurtleRules.kernel import backtest
+    result = backtest(candles, start=240, entry_dc_period=55, exit_dc_period=20, maximum_pyramiding_levels=2)
+    result['trades'], result['net_profit']
+"""
+
+import numpy as np
+import jesse.indicators as ta
+
+from shared.trial_cache import cached_indicator
+
+from . import TurtleRules
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional: the kernel is plain Python that Numba can compile
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+OPEN, INCREASE, CLOSE = 0, 1, 2
+
+# the class' settings, the defaults of `backtest`
+VARS = TurtleRules.VARS
+
+
+@njit(cache=True)
+def record(events, count, event, index, qty, price):
+    events[count, 0] = event
+    events[count, 1] = index
+    events[count, 2] = qty
+    events[count, 3] = price
+    return count + 1
+
+
+@njit(cache=True)
+def run(open_, high, low, close, entry_upper, entry_lower, exit_upper, exit_lower, atr, start, starting_balance,
+        fee_rate, unit_risk_percent, atr_multiplier, maximum_pyramiding_levels, pyramiding_threshold, s1_filter):
+    """
+    Returns the fills as an array of (event, candle index, qty, price) rows,
+    event being OPEN, INCREASE or CLOSE and qty signed for OPEN and CLOSE,
+    and the final balance.
+    """
+    n = len(close)
+    # at most a close and an open per candle, and the close at the end
+    events = np.empty((2 * n + 1, 4))
+    count = 0
+
+    balance = starting_balance
+    qty = 0.0
+    entry_price = 0.0
+    stop = np.nan
+    levels = 0
+    last_opened_price = 0.0
+    last_was_profitable = False
+
+    for i in range(start, n):
+        price = close[i]
+
+        # stop of the open position, filled at the open when the candle gaps through it
+        if qty != 0 and stop == stop:
+            fill = np.nan
+            if qty > 0 and low[i] <= stop:
+                fill = min(open_[i], stop)
+            elif qty < 0 and high[i] >= stop:
+                fill = max(open_[i], stop)
+            if fill == fill:
+                pnl = qty * (fill - entry_price) - fee_rate * abs(qty) * fill
+                balance += pnl
+                last_was_profitable = pnl > 0
+                count = record(events, count, CLOSE, i, qty, fill)
+                qty = 0.0
+                stop = np.nan
+
+        # entry_signal() and exit_signal()
+        entry = 0
+        if high[i] >= entry_upper[i]:
+            entry = 1
+        elif low[i] <= entry_lower[i]:
+            entry = -1
+        exit_ = 0
+        if high[i] >= exit_upper[i]:
+            exit_ = 1
+        elif low[i] <= exit_lower[i]:
+            exit_ = -1
+
+        # update_position()
+        if qty != 0:
+            side = 1 if qty > 0 else -1
+            add = False
+            if levels < maximum_pyramiding_levels:
+                if side == 1 and price > last_opened_price + pyramiding_threshold * atr[i]:
+                    add = True
+                if side == -1 and price < last_opened_price - pyramiding_threshold * atr[i]:
+                    add = True
+
+            if entry == -side or exit_ == -side:
+                pnl = qty * (price - entry_price) - fee_rate * abs(qty) * price
+                balance += pnl
+                last_was_profitable = pnl > 0
+                count = record(events, count, CLOSE, i, qty, price)
+                qty = 0.0
+                stop = np.nan
+                levels = 0
+            elif add:
+                unit = unit_risk_percent / 100 * balance / atr[i]
+                balance -= fee_rate * unit * price
+                total = abs(qty) + unit
+                entry_price = (entry_price * abs(qty) + price * unit) / total
+                qty = side * total
+                count = record(events, count, INCREASE, i, unit, price)
+                # on_increased_position()
+                stop = price - side * atr_multiplier * atr[i]
+                levels += 1
+                last_opened_price = price
+
+        # should_short()/should_long(), go_short()/go_long() and the S1 filter
+        if qty == 0 and entry != 0:
+            unit = unit_risk_percent / 100 * balance / atr[i]
+            levels += 1
+            last_opened_price = price
+            if s1_filter and last_was_profitable:
+                last_was_profitable = False
+            else:
+                balance -= fee_rate * unit * price
+                qty = entry * unit
+                entry_price = price
+                stop = price - entry * atr_multiplier * atr[i]
+                count = record(events, count, OPEN, i, qty, price)
+
+    # like Jesse, the position still open when the candles end is closed at the last close
+    if qty != 0:
+        price = close[n - 1]
+        balance += qty * (price - entry_price) - fee_rate * abs(qty) * price
+        count = record(events, count, CLOSE, n - 1, qty, price)
+
+    return events[:count], balance
+
+
+def atr_series(candles, period=20, window=240):
+    """
+    ATR at every candle. With `window`, each value is computed over the last
+    `window` candles only, which is what the class' non sequential
+    `atr(self.candles, period)` returns; with `window=None` it is the
+    sequential ATR over the whole history, which is faster and differs by a
+    few millionths.
+    """
+    if window is None:
+        return ta.atr(candles, period, sequential=True)
+    return np.array([ta.atr(candles[max(i + 1 - window, 0):i + 1], period) for i in range(len(candles))])
+
+
+def trades(candles, events):
+    """
+    The trades (one per position, with its units) of the fills returned by `run`.
+    """
+    result = []
+    for event, index, qty, price in events:
+        index = int(index)
+        if event == OPEN:
+            trade = {'type': 'long' if qty > 0 else 'short', 'entry_index': index, 'opened_at': candles[index, 0],
+                     'units': 1, 'qty': abs(qty), 'entry_price': price}
+        elif event == INCREASE:
+            trade['entry_price'] = (trade['entry_price'] * trade['qty'] + price * qty) / (trade['qty'] + qty)
+            trade['qty'] += qty
+            trade['units'] += 1
+        else:
+            side = 1 if qty > 0 else -1
+            trade.update({'exit_index': index, 'closed_at': candles[index, 0], 'exit_price': price,
+                          'PNL': side * trade['qty'] * (price - trade['entry_price'])})
+            result.append(trade)
+    return result
+
+
+def backtest(candles, start=0, entry_dc_period=VARS['entry_dc_period'], exit_dc_period=VARS['exit_dc_period'],
+             atr_period=VARS['atr_period'], atr_multiplier=VARS['atr_multiplier'],
+             maximum_pyramiding_levels=VARS['maximum_pyramiding_levels'],
+             pyramiding_threshold=VARS['pyramiding_threshold'], unit_risk_percent=VARS['unit_risk_percent'],
+             s1_filter=False, starting_balance=10_000, fee_rate=0, atr=None):
+    """
+    Runs the rules over `candles` (warmup candles included, trading from
+    index `start`) with the class' vars as keyword arguments. A precomputed
+    `atr` (see `atr_series`) can be passed to reuse it across runs. Returns
+    a dict with the fills, the trades (PNL before fees, the last one closed
+    at the end of the candles if it was still open), the net profit (after
+    fees) and the number of trades.
+    """
+    entry = ta.donchian(candles, entry_dc_period, sequential=True)
+    exit_ = ta.donchian(candles, exit_dc_period, sequential=True)
+    if atr is None:
+        # the windowed ATR is the slowest part, so it is kept for the next runs on the same candles
+        atr = cached_indicator(candles, 'turtle_atr', (atr_period, 240), lambda c: atr_series(c, atr_period))
+
+    events, balance = run(candles[:, 1], candles[:, 3], candles[:, 4], candles[:, 2], entry.upperband, entry.lowerband,
+                 exit_.upperband, exit_.lowerband, np.asarray(atr, dtype=float), start, float(starting_balance),
+                 float(fee_rate), float(unit_risk_percent), float(atr_multiplier), int(maximum_pyramiding_levels),
+                 float(pyramiding_threshold), bool(s1_filter))
+    result = trades(candles, events)
+    return {
+        'events': events,
+        'trades': result,
+        'net_profit': balance - starting_balance,
+        'total': len(result),
+    }
@@ -0,0 +1,8 @@
+"""
+Shared helpers used by the example strategies.
+
+Strategies that import from this package need the `shared` folder copied
+into the root of your Jesse project (next to the `strategies` directory).
+Jesse adds the project root to the python path, so `from shared.cache import ...`
+works from inside any strategy.
+"""
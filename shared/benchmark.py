@@ -0,0 +1,528 @@
+"""
+Micro-benchmarks of the strategies, without Jesse's backtest engine.
+
+A small stand-in for the Jesse runtime (`StubEngine`) drives a strategy over a
+candle array the same way Jesse calls its hooks at the close of each candle:
+before, update_position (while a position is open), should_short/should_long,
+go_long/go_short, filters, the on_*_position events and after, and terminate
+at the end. Orders are filled at the closing price, stop losses and take
+profits when a candle reaches them, and there are no margin rules, so the
+trades are only roughly those of a real backtest: the point is to time the
+strategy's own code.
+
+For every strategy and candle array it reports the latency percentiles of
+each candle and of each hook, the throughput (candles per second) and the
+peak memory of the process that ran it (each run gets a fresh process). The
+results are saved as JSON so runs of different versions can be compared.
+
+Usage, from the root of the Jesse project:
+    python -m shared.benchmark DUAL_THRUST MAGen --bars 1000 100000
+    python -m shared.benchmark TurtleRules --candles storage/BTC-USDT-4h.npy --timeframe 4h
+    python -m shared.benchmark --compare storage/benchmarks/previous.json
+    python -m shared.benchmark Donchian TurtleRules DUAL_THRUST --sparse --timeframe 1m
+
+Recorded candles are .npy or .csv files in Jesse's column order (timestamp,
+open, close, high, low, volume) in the timeframe given with --timeframe.
+"""
+
+import argparse
+import importlib
+import importlib.metadata
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import jesse.helpers as jh
+
+from .candle_store import load_candles
+
+WARMUP_CANDLES = 240
+HOOKS = (
+    'before', 'update_position', 'should_short', 'should_long', 'go_long', 'go_short', 'filters',
+    'on_open_position', 'on_increased_position', 'on_close_position', 'after',
+)
+
+
+def synthetic_candles(bars, timeframe='1h', seed=1):
+    """
+    Random walk candles (in Jesse's column order) of `timeframe`.
+    """
+    rng = np.random.default_rng(seed)
+    period = jh.timeframe_to_one_minutes(timeframe) * 60_000
+    timestamps = 1_600_000_000_000 // period * period + np.arange(bars) * period
+    close = 10_000 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, bars)))
+    volume = rng.uniform(1, 100, bars)
+    return np.column_stack([timestamps, open_, close, high, low, volume])
+
+
+def strategy_class(name):
+    return getattr(importlib.import_module(name), name)
+
+
+def strategy_names(directory):
+    return sorted(
+        name for name in os.listdir(directory)
+        if name != 'shared' and os.path.isfile(os.path.join(directory, name, '__init__.py'))
+    )
+
+
+class FormingCandles:
+    """
+    The candles of a bigger timeframe as Jesse returns them from get_candles()
+    at the close of each candle: the last one is still forming. Candles have
+    to be requested in order.
+    """
+
+    def __init__(self, candles, timeframe):
+        period = jh.timeframe_to_one_minutes(timeframe) * 60_000
+        blocks = candles[:, 0] // period
+        new_block = np.r_[True, blocks[1:] != blocks[:-1]]
+        self.starts = np.flatnonzero(new_block)
+        self.block_of = np.cumsum(new_block) - 1
+        self.candles = candles
+        ends = np.r_[self.starts[1:], len(candles)]
+        self.buffer = np.column_stack([
+            blocks[self.starts] * period,
+            candles[self.starts, 1],
+            candles[ends - 1, 2],
+            np.maximum.reduceat(candles[:, 3], self.starts),
+            np.minimum.reduceat(candles[:, 4], self.starts),
+            np.add.reduceat(candles[:, 5], self.starts),
+        ])
+
+    def at(self, index):
+        block = self.block_of[index]
+        forming = self.candles[self.starts[block]:index + 1]
+        row = self.buffer[block]
+        row[2], row[3], row[4], row[5] = forming[-1, 2], forming[:, 3].max(), forming[:, 4].min(), forming[:, 5].sum()
+        return self.buffer[:block + 1]
+
+
+class StubPosition:
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.qty = 0.0
+        self.entry_price = None
+
+    @property
+    def is_open(self):
+        return self.qty != 0
+
+    @property
+    def is_close(self):
+        return self.qty == 0
+
+    @property
+    def type(self):
+        return 'long' if self.qty > 0 else 'short' if self.qty < 0 else 'close'
+
+    @property
+    def value(self):
+        return abs(self.qty) * self.strategy.price
+
+    @property
+    def pnl(self):
+        return self.qty * (self.strategy.price - self.entry_price) if self.is_open else 0
+
+    @property
+    def pnl_percentage(self):
+        return self.pnl / (abs(self.qty) * self.entry_price) * 100 if self.is_open else 0
+
+
+class StubRuntime:
+    """
+    Replaces the members of jesse.strategies.Strategy that read Jesse's stores.
+    """
+
+    @property
+    def candles(self):
+        return self._stub.candles[:self.index + 1]
+
+    @property
+    def current_candle(self):
+        return self._stub.candles[self.index]
+
+    @property
+    def time(self):
+        return self.current_candle[0]
+
+    @property
+    def open(self):
+        return self.current_candle[1]
+
+    @property
+    def close(self):
+        return self.current_candle[2]
+
+    @property
+    def price(self):
+        return self.current_candle[2]
+
+    @property
+    def high(self):
+        return self.current_candle[3]
+
+    @property
+    def low(self):
+        return self.current_candle[4]
+
+    @property
+    def volume(self):
+        return self.current_candle[5]
+
+    @property
+    def balance(self):
+        return self._stub.balance
+
+    @property
+    def capital(self):
+        return self._stub.balance
+
+    @property
+    def available_margin(self):
+        return self._stub.balance - self.position.value
+
+    @property
+    def fee_rate(self):
+        return self._stub.fee_rate
+
+    @property
+    def is_long(self):
+        return self.position.qty > 0
+
+    @property
+    def is_short(self):
+        return self.position.qty < 0
+
+    @property
+    def is_open(self):
+        return self.position.is_open
+
+    @property
+    def is_close(self):
+        return self.position.is_close
+
+    def get_candles(self, exchange, symbol, timeframe):
+        if timeframe == self.timeframe:
+            return self.candles
+        return self._stub.forming_candles(timeframe).at(self.index)
+
+    def liquidate(self):
+        if self.position.is_open:
+            self._stub.close_position(self.price)
+
+    @staticmethod
+    def log(msg, log_type='info', send_notification=False, webhook=None):
+        pass
+
+
+def _order(order):
+    """
+    Total qty and first price of an order, given as (qty, price) or as a list of them.
+    """
+    if np.ndim(order) == 1:
+        return abs(order[0]), order[1]
+    return sum(abs(o[0]) for o in order), order[0][1]
+
+
+class StubEngine:
+    """
+    Runs `cls` over `candles` (the first `warmup` of them are only history) and
+    times every hook call.
+    """
+
+    def __init__(self, cls, candles, timeframe, hp=None, warmup=WARMUP_CANDLES, starting_balance=10_000,
+                 fee_rate=0.0, sparse=False):
+        self.cls = cls
+        self.candles = candles
+        self.timeframe = timeframe
+        self.warmup = warmup
+        self.balance = float(starting_balance)
+        self.fee_rate = fee_rate
+        self.stop = self.take = None
+        self.trades = 0
+        # (event, candle index, qty, price) of every fill
+        self.events = []
+        # only call the hooks on the candidate candles (see shared/sparse.py)
+        self.sparse = sparse
+        self.skipped = 0
+        self._forming = {}
+
+        strategy = type(cls.__name__, (StubRuntime, cls), {})()
+        strategy._stub = self
+        strategy.name = cls.__name__
+        strategy.exchange, strategy.symbol, strategy.timeframe = 'Benchmark', 'BTC-USDT', timeframe
+        strategy.hp = {p['name']: p['default'] for p in strategy.hyperparameters()}
+        strategy.hp.update(hp or {})
+        strategy.position = StubPosition(strategy)
+        self.strategy = strategy
+
+        self.bar_times = array('q')
+        self.hook_times = {hook: array('q') for hook in HOOKS}
+
+    def forming_candles(self, timeframe):
+        if timeframe not in self._forming:
+            self._forming[timeframe] = FormingCandles(self.candles, timeframe)
+        return self._forming[timeframe]
+
+    def call(self, hook, *args):
+        start = time.perf_counter_ns()
+        result = getattr(self.strategy, hook)(*args)
+        self.hook_times[hook].append(time.perf_counter_ns() - start)
+        return result
+
+    def open_position(self, side, order):
+        qty, price = _order(order)
+        self.balance -= self.fee_rate * qty * price
+        position = self.strategy.position
+        position.entry_price = price
+        position.qty = side * qty
+        self.trades += 1
+        self.events.append(('open', self.strategy.index, side * qty, price))
+
+    def increase_position(self, order):
+        qty, price = _order(order)
+        self.balance -= self.fee_rate * qty * price
+        position = self.strategy.position
+        total = abs(position.qty) + qty
+        position.entry_price = (position.entry_price * abs(position.qty) + price * qty) / total
+        position.qty = np.sign(position.qty) * total
+        self.events.append(('increase', self.strategy.index, qty, price))
+
+    def close_position(self, price):
+        position = self.strategy.position
+        self.events.append(('close', self.strategy.index, position.qty, price))
+        self.balance += position.qty * (price - position.entry_price) - self.fee_rate * abs(position.qty) * price
+        position.qty = 0.0
+        position.entry_price = None
+        self.stop = self.take = None
+
+    def update_exits(self):
+        s = self.strategy
+        if s.stop_loss is not None:
+            self.stop = _order(s.stop_loss)[1]
+        if s.take_profit is not None:
+            self.take = _order(s.take_profit)[1]
+
+    def exit_price(self):
+        """
+        Price the stop loss or take profit of the open position fills at on the current candle, if any.
+        """
+        s = self.strategy
+        long = s.position.qty > 0
+        # filled at the open instead when the candle opened past them
+        if self.stop is not None and (s.low <= self.stop if long else s.high >= self.stop):
+            return min(s.open, self.stop) if long else max(s.open, self.stop)
+        if self.take is not None and (s.high >= self.take if long else s.low <= self.take):
+            return max(s.open, self.take) if long else min(s.open, self.take)
+        return None
+
+    def fill_exits(self):
+        price = self.exit_price()
+        if price is not None:
+            self.close_position(price)
+            self.call('on_close_position', None, None)
+
+    def step(self):
+        s = self.strategy
+        self.call('before')
+
+        if s.position.is_open:
+            self.fill_exits()
+        if s.position.is_open:
+            s.buy = s.sell = None
+            self.call('update_position')
+            if s.position.is_close:
+                self.call('on_close_position', None, None)
+            else:
+                order = s.buy if s.is_long else s.sell
+                if order is not None:
+                    self.increase_position(order)
+                    self.call('on_increased_position', None)
+                    self.update_exits()
+
+        if s.position.is_close:
+            s.buy = s.sell = s.stop_loss = s.take_profit = None
+            should_short = self.call('should_short')
+            should_long = self.call('should_long')
+            if should_long or should_short:
+                self.call('go_long' if should_long else 'go_short')
+                start = time.perf_counter_ns()
+                passed = all(f() for f in s.filters())
+                self.hook_times['filters'].append(time.perf_counter_ns() - start)
+                order = s.buy if should_long else s.sell
+                if passed and order is not None:
+                    self.open_position(1 if should_long else -1, order)
+                    self.call('on_open_position', None)
+                    self.update_exits()
+
+        self.call('after')
+
+    def run(self):
+        s = self.strategy
+        if self.sparse:
+            from .sparse import candidates
+            entry, exit_ = candidates(self.cls, self.candles, self.timeframe, s.hp)
+        for index in range(self.warmup, len(self.candles)):
+            s.index = index
+            if self.sparse and not (entry[index] if s.position.is_close
+                                    else exit_[index] or self.exit_price() is not None):
+                self.skipped += 1
+                continue
+            start = time.perf_counter_ns()
+            self.step()
+            self.bar_times.append(time.perf_counter_ns() - start)
+        s.before_terminate()
+        s.terminate()
+        return self
+
+
+def latency(nanoseconds):
+    values = np.frombuffer(nanoseconds, dtype=np.int64) / 1000 if len(nanoseconds) else np.zeros(1)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'mean_us': values.mean(), 'p50_us': p50, 'p90_us': p90, 'p99_us': p99, 'max_us': values.max()}
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+def benchmark(name, bars, timeframe, candles_path=None, hp=None, seed=1, path='.', sparse=False):
+    """
+    Runs one strategy over one candle array and returns its measurements.
+    Meant to run in a fresh process, so the memory figures are its own.
+    """
+    path = os.path.abspath(path)
+    # the strategies import `shared`, which lives next to the strategies directory of a Jesse project
+    sys.path[:0] = [path, os.path.dirname(path)]
+    cls = strategy_class(name)
+    if candles_path:
+        candles = load_candles(candles_path)
+        if bars:
+            candles = candles[:bars + WARMUP_CANDLES]
+        dataset = os.path.basename(candles_path)
+    else:
+        candles = synthetic_candles(bars + WARMUP_CANDLES, timeframe, seed)
+        dataset = f'synthetic-{seed}'
+
+    rss_before = max_rss_mb()
+    engine = StubEngine(cls, candles, timeframe, hp, sparse=sparse)
+    start = time.perf_counter()
+    engine.run()
+    total = time.perf_counter() - start
+
+    bar_total = sum(engine.bar_times)
+    hooks = {}
+    for hook, times in engine.hook_times.items():
+        if len(times):
+            hooks[hook] = {
+                'calls': len(times),
+                'calls_per_bar': len(times) / (len(engine.bar_times) + engine.skipped),
+                'total_seconds': sum(times) / 1e9,
+                'share': sum(times) / bar_total if bar_total else 0,
+                **latency(times),
+            }
+    return {
+        'strategy': name,
+        'dataset': dataset,
+        'timeframe': timeframe,
+        'bars': len(engine.bar_times) + engine.skipped,
+        'skipped_bars': engine.skipped,
+        'trades': engine.trades,
+        'total_seconds': total,
+        'bars_per_second': (len(engine.bar_times) + engine.skipped) / total if total else 0,
+        'bar': latency(engine.bar_times),
+        'hooks': hooks,
+        'peak_rss_mb': max_rss_mb(),
+        'rss_growth_mb': max_rss_mb() - rss_before,
+    }
+
+
+def run_isolated(*args, **kwargs):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(benchmark, *args, **kwargs).result()
+
+
+def compare(results, previous):
+    """
+    Prints the throughput and p99 latency changes against a previous run.
+    """
+    before = {(r['strategy'], r['dataset'], r['bars']): r for r in previous['results'] if 'error' not in r}
+    for r in results:
+        old = before.get((r['strategy'], r['dataset'], r['bars']))
+        if old is None or 'error' in r:
+            continue
+        speed = r['bars_per_second'] / old['bars_per_second'] - 1
+        p99 = r['bar']['p99_us'] / old['bar']['p99_us'] - 1
+        print(f"{r['strategy']:<16} {r['dataset']:<16} {r['bars']:>9}  throughput {speed:+.1%}  p99 {p99:+.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks strategies with a stand-in for the Jesse runtime.')
+    parser.add_argument('strategies', nargs='*', help='strategy names (all of them by default)')
+    parser.add_argument('--bars', type=int, nargs='+', default=[1_000, 10_000], help='candles after the warmup')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--candles', nargs='*', default=[], help='recorded candle files (.npy or .csv)')
+    parser.add_argument('--hp', type=json.loads, default=None, help='hyperparameters as JSON')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--path', default='strategies' if os.path.isdir('strategies') else '.',
+                        help='directory containing the strategies')
+    parser.add_argument('--output', default=f'storage/benchmarks/{time.strftime("%Y-%m-%dT%H-%M-%S")}.json')
+    parser.add_argument('--compare', help='previous results to compare with')
+    parser.add_argument('--sparse', action='store_true',
+                        help='only call the hooks on the candidate candles (see shared/sparse.py)')
+    args = parser.parse_args(argv)
+
+    names = args.strategies or strategy_names(args.path)
+    runs = [(bars, None) for bars in args.bars] + [(None, path) for path in args.candles]
+    results = []
+    for name in names:
+        for bars, candles_path in runs:
+            try:
+                result = run_isolated(name, bars, args.timeframe, candles_path, args.hp, args.seed, args.path,
+                                      args.sparse)
+            except Exception as e:
+                result = {'strategy': name, 'dataset': candles_path or f'synthetic-{args.seed}', 'bars': bars,
+                          'error': f'{type(e).__name__}: {e}'}
+                print(f"{name:<16} {result['dataset']:<16} {bars or '':>9}  {result['error']}")
+            else:
+                print(f"{name:<16} {result['dataset']:<16} {result['bars']:>9}  "
+                      f"{result['bars_per_second']:>10.0f} bars/s  p50 {result['bar']['p50_us']:.1f}us  "
+                      f"p99 {result['bar']['p99_us']:.1f}us  peak {result['peak_rss_mb']:.0f}MB")
+            results.append(result)
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'jesse': importlib.metadata.version('jesse'),
+            'machine': platform.machine(),
+            'timeframe': args.timeframe,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=float)
+    print(f'Saved to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
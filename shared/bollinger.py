@@ -0,0 +1,94 @@
+"""
+Streaming Bollinger Bands.
+
+Follows `jesse.indicators.bollinger_bands` with its default SMA middle band
+and (population) standard deviation. The mean and the sum of squared
+deviations of the window are updated with Welford's recurrences as values
+enter and leave it, which stays accurate when the deviation is tiny compared
+to the price, unlike sums of squares. The rounding errors of the removals are
+wiped out by recomputing both from the window every `RESYNC` candles.
+
+On a window where every value is the same, the batch function returns NaN
+bands, bands equal to the middle band or bands slightly apart depending on
+how its running sums round; this always returns bands (almost) equal to the
+middle band.
+"""
+
+from collections import deque, namedtuple
+from math import sqrt
+
+import numpy as np
+import jesse.indicators as ta
+
+from .streaming import StreamingIndicator, candle_source
+
+BollingerBands = namedtuple('BollingerBands', ['upperband', 'middleband', 'lowerband'])
+
+RESYNC = 1024
+
+
+class StreamingBollingerBands(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.bollinger_bands` (matype 0, devtype 0).
+    Returns NaNs until `period` candles are available, like the batch function.
+    """
+
+    def __init__(self, period=20, devup=2, devdn=2, source_type="close"):
+        super().__init__()
+        self.period = period
+        self.devup = devup
+        self.devdn = devdn
+        self.source_type = source_type
+        # source values of the last `period - 1` committed candles, with their mean and sum of squared deviations
+        self.window = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def reset(self):
+        super().reset()
+        self.window.clear()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, candle):
+        value = candle_source(candle, self.source_type)
+        window = self.window
+        window.append(value)
+        n = len(window)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+
+        # the peeked candle completes the window, so only `period - 1` committed values are kept
+        if n > self.period - 1:
+            old = window.popleft()
+            n -= 1
+            if n:
+                delta = old - self.mean
+                self.mean -= delta / n
+                self.m2 -= delta * (old - self.mean)
+            else:
+                self.mean = self.m2 = 0.0
+
+        if (self.count + 1) % RESYNC == 0 and window:
+            values = np.fromiter(window, dtype=float, count=len(window))
+            self.mean = values.mean()
+            self.m2 = ((values - self.mean) ** 2).sum()
+
+    def peek(self, candle):
+        if self.count + 1 < self.period:
+            return BollingerBands(np.nan, np.nan, np.nan)
+
+        value = candle_source(candle, self.source_type)
+        delta = value - self.mean
+        mean = self.mean + delta / self.period
+        m2 = self.m2 + delta * (value - mean)
+        std = sqrt(max(m2, 0.0) / self.period)
+        return BollingerBands(mean + self.devup * std, mean, mean - self.devdn * std)
+
+    def batch(self, candles):
+        bands = ta.bollinger_bands(candles, self.period, self.devup, self.devdn, source_type=self.source_type)
+        # on a flat window the batch variance can round below zero, which gives NaN bands instead of no deviation
+        if np.isnan(bands.upperband) and not np.isnan(bands.middleband):
+            return BollingerBands(bands.middleband, bands.middleband, bands.middleband)
+        return bands
@@ -0,0 +1,52 @@
+"""
+Per-candle memoization for strategy indicators.
+
+Jesse calls the strategy hooks several times per candle (should_long, filters,
+go_long, update_position, on_* events) and every bare `@property` indicator is
+recomputed on each access. `bar_cached` stores the result of a property or
+method until the current candle changes, so each indicator is computed at most
+once per bar.
+
+Usage:
+    @property
+    @bar_cached
+    def atr(self):
+        return ta.atr(self.candles)
+"""
+
+from functools import wraps
+
+
+def bar_key(strategy):
+    # The whole current candle (timestamp, open, close, high, low, volume) is part
+    # of the key, so a forming candle that gets updated (e.g. an order filled in
+    # the middle of the bar) invalidates the cache as well as a newly closed one.
+    candle = strategy.current_candle
+    hp = strategy.hp
+    return tuple(candle.tolist()), tuple(hp.items()) if hp else None
+
+
+def bar_cached(method):
+    """
+    Caches the result of a strategy method until a new candle arrives.
+    The cache is keyed by the current candle and the strategy hyperparameters.
+    Extra (hashable) positional arguments are part of the cache key.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def decorated(self, *args):
+        key = bar_key(self)
+        cache = self.__dict__.get('_bar_cache')
+        if cache is None or cache[0] != key:
+            # new candle (or new hyperparameters): drop every value of the previous bar
+            cache = (key, {})
+            self._bar_cache = cache
+
+        values = cache[1]
+        entry = (name, *args)
+        if entry not in values:
+            values[entry] = method(self, *args)
+        return values[entry]
+
+    return decorated
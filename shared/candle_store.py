@@ -0,0 +1,156 @@
+"""
+On-disk candle store read through memory maps.
+
+Every (exchange, symbol, timeframe) is one .npy file holding the candles in
+Jesse's column order (timestamp, open, close, high, low, volume) but laid out
+column by column (Fortran order). Opening it maps the file instead of
+reading it, so it takes the same time for a week or for years of one minute
+candles, and the array still indexes like any candle array
+(`candles[:, 2]` is the closes) while only the pages that are touched are
+read from disk. Reading one column only reads that column.
+
+An `index.json` file next to the candle files lists what the store holds
+(rows and first/last timestamps), so looking a series up does not open it.
+Series are written whole; write them from one process at a time.
+
+Usage:
+    from shared.candle_store import CandleStore
+    store = CandleStore('storage/candles')
+    store.write('Binance Spot', 'BTC-USDT', '1m', candles)
+    candles = store.get('Binance Spot', 'BTC-USDT', '1m', start=..., finish=...)
+
+The files are plain .npy files, so they can also be shared with worker
+processes as is (see `SharedCandles.from_file` in shared/workers.py) or given
+to the benchmark with --candles. `load_candles()` reads a single .npy or .csv
+file of candles, like the ones the command line tools take.
+"""
+
+import json
+import os
+
+import numpy as np
+
+COLUMNS = ('timestamp', 'open', 'close', 'high', 'low', 'volume')
+
+
+def load_candles(path):
+    """
+    Candles of a .npy file (memory mapped) or of a .csv file, in Jesse's column order.
+    """
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    return np.loadtxt(path, delimiter=',', ndmin=2)
+
+
+class CandleStore:
+    def __init__(self, root='storage/candles'):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self.index = {}
+        self.reload()
+
+    def reload(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    @staticmethod
+    def key(exchange, symbol, timeframe):
+        return f'{exchange}/{symbol}/{timeframe}'
+
+    def path(self, exchange, symbol, timeframe):
+        parts = [str(part).replace('/', '-').replace(os.sep, '-') for part in (exchange, symbol, timeframe)]
+        return os.path.join(self.root, parts[0], parts[1], f'{parts[2]}.npy')
+
+    def __contains__(self, key):
+        return self.key(*key) in self.index
+
+    def keys(self):
+        """
+        (exchange, symbol, timeframe) of every series in the store.
+        """
+        return [tuple(entry['key']) for entry in self.index.values()]
+
+    def info(self, exchange, symbol, timeframe):
+        """
+        Number of rows and first/last timestamps of a series, without opening it.
+        """
+        return self.index[self.key(exchange, symbol, timeframe)]
+
+    def write(self, exchange, symbol, timeframe, candles):
+        """
+        Saves (or replaces) the candles of a series. They are expected to be
+        sorted by timestamp.
+        """
+        candles = np.asarray(candles, dtype=np.float64)
+        if candles.ndim != 2 or candles.shape[1] != len(COLUMNS):
+            raise ValueError(f'candles should have {len(COLUMNS)} columns ({", ".join(COLUMNS)}).')
+
+        path = self.path(exchange, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written aside and moved in place, so a reader never maps a half written file
+        tmp = f'{path}.{os.getpid()}.tmp'
+        array = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=candles.shape, fortran_order=True)
+        array[:] = candles
+        array.flush()
+        del array
+        os.replace(tmp, path)
+
+        # another process may have added series since the index was loaded
+        self.reload()
+        self.index[self.key(exchange, symbol, timeframe)] = {
+            'key': [exchange, symbol, timeframe],
+            'path': os.path.relpath(path, self.root),
+            'rows': len(candles),
+            'first_timestamp': int(candles[0, 0]) if len(candles) else None,
+            'last_timestamp': int(candles[-1, 0]) if len(candles) else None,
+        }
+        self.save_index()
+
+    def save_index(self):
+        tmp = f'{self.index_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def get(self, exchange, symbol, timeframe, start=None, finish=None):
+        """
+        Read-only memory mapped candles of a series, optionally only those
+        with `start <= timestamp < finish` (timestamps in milliseconds).
+        Raises a KeyError when the series is not in the store.
+        """
+        entry = self.info(exchange, symbol, timeframe)
+        candles = np.load(os.path.join(self.root, entry['path']), mmap_mode='r')
+        if start is None and finish is None:
+            return candles
+
+        # binary search on the timestamp column only touches a few pages
+        timestamps = candles[:, 0]
+        first = 0 if start is None else np.searchsorted(timestamps, start)
+        last = len(candles) if finish is None else np.searchsorted(timestamps, finish)
+        return candles[first:last]
+
+    def backtest_candles(self, exchange, symbol, start, finish, warmup_minutes=0):
+        """
+        The `candles` and `warmup_candles` dicts `jesse.research.backtest`
+        expects for one route, as memory mapped views of the one minute
+        candles of the store. The warmup candles are the `warmup_minutes`
+        candles before `start`.
+        """
+        key = f'{exchange}-{symbol}'
+        candles = {key: {'exchange': exchange, 'symbol': symbol, 'candles': self.get(exchange, symbol, '1m', start, finish)}}
+        if not warmup_minutes:
+            return candles, None
+
+        before = self.get(exchange, symbol, '1m', finish=start)
+        warmup = before[max(len(before) - warmup_minutes, 0):]
+        return candles, {key: {'exchange': exchange, 'symbol': symbol, 'candles': warmup}}
+
+    def import_candles(self, exchange, symbol, timeframe, start_date_timestamp, finish_date_timestamp):
+        """
+        Copies candles from Jesse's database into the store.
+        """
+        from jesse.research import get_candles
+
+        _, candles = get_candles(exchange, symbol, timeframe, start_date_timestamp, finish_date_timestamp)
+        self.write(exchange, symbol, timeframe, candles)
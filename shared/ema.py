@@ -0,0 +1,98 @@
+"""
+Streaming EMA and MACD.
+
+Both follow the recursion of `jesse.indicators.ema`/`macd` with
+`sequential=True`: the EMA is seeded with the first value of the source and
+the signal line is an EMA of the MACD line. They are not the values of the
+non sequential batch calls, which only look at the last `warmup_candles_num`
+candles (240 by default) and so restart from a seed at the start of that
+window. After 240 candles the seed still weighs (1 - 2 / (period + 1)) ** 239
+of the value, about 9% for a period of 200: long periods differ enough to
+change crossovers, and so trades.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import jesse.indicators as ta
+
+from .streaming import StreamingIndicator, candle_source
+
+
+def ema_step(previous, value, alpha):
+    # the first value seeds the average
+    if previous is None:
+        return value
+    return alpha * value + (1 - alpha) * previous
+
+
+class StreamingEMA(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.ema`. Returns NaN until `period`
+    candles are available, like the batch function.
+    """
+
+    def __init__(self, period=5, source_type="close"):
+        super().__init__()
+        self.period = period
+        self.source_type = source_type
+        self.alpha = 2 / (period + 1)
+        self.value = None
+
+    def reset(self):
+        super().reset()
+        self.value = None
+
+    def push(self, candle):
+        self.value = ema_step(self.value, candle_source(candle, self.source_type), self.alpha)
+
+    def peek(self, candle):
+        if self.count + 1 < self.period:
+            return np.nan
+        return ema_step(self.value, candle_source(candle, self.source_type), self.alpha)
+
+    def batch(self, candles):
+        return ta.ema(candles, self.period, source_type=self.source_type, sequential=True)[-1]
+
+
+MACD = namedtuple('MACD', ['macd', 'signal', 'hist'])
+
+
+class StreamingMACD(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.macd`.
+    """
+
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9, source_type="close"):
+        super().__init__()
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.signal_period = signal_period
+        self.source_type = source_type
+        self.fast_alpha = 2 / (fast_period + 1)
+        self.slow_alpha = 2 / (slow_period + 1)
+        self.signal_alpha = 2 / (signal_period + 1)
+        self.fast = self.slow = self.signal = None
+
+    def reset(self):
+        super().reset()
+        self.fast = self.slow = self.signal = None
+
+    def step(self, candle):
+        value = candle_source(candle, self.source_type)
+        fast = ema_step(self.fast, value, self.fast_alpha)
+        slow = ema_step(self.slow, value, self.slow_alpha)
+        signal = ema_step(self.signal, fast - slow, self.signal_alpha)
+        return fast, slow, signal
+
+    def push(self, candle):
+        self.fast, self.slow, self.signal = self.step(candle)
+
+    def peek(self, candle):
+        fast, slow, signal = self.step(candle)
+        return MACD(fast - slow, signal, fast - slow - signal)
+
+    def batch(self, candles):
+        result = ta.macd(candles, self.fast_period, self.slow_period, self.signal_period,
+                         source_type=self.source_type, sequential=True)
+        return MACD(result.macd[-1], result.signal[-1], result.hist[-1])
@@ -0,0 +1,154 @@
+"""
+Successive halving: a search that spends most of its backtests on the
+candidates that are worth it.
+
+Backtesting every candidate of an optimization over years of candles is
+wasted on the ones that are obviously bad after a few months. Here all the
+candidates are first evaluated on a short window of the most recent candles,
+only the best 1/`eta` of them are evaluated again on a window `eta` times
+longer, and so on up to the whole history (the last rung). With 4 rungs and
+`eta=3`, each rung costs as much as backtesting the whole population over
+1/27 of the history, so the whole search costs about 15% of backtesting
+every candidate over everything.
+
+The windows are nested (they all end on the last candle), and every window
+keeps its own warmup candles, so a strategy trades a window exactly as it
+would trade the end of the whole history. The candidates of a rung are
+evaluated in parallel by the evaluator:
+ - `search_backtests()` runs Jesse backtests of any strategy (e.g. MAGen)
+   with shared/workers.py's `backtest_many`, the candles of the window in
+   shared memory and, optionally, its run cache
+ - DUAL_THRUST's `population.halving_search()` uses its vectorized
+   population evaluator
+
+Usage:
+    from shared import halving
+    from strategies.MAGen import MAGen
+    result = halving.search_backtests(config, routes, data_routes, candles, warmup_candles,
+                                      halving.sample(MAGen, 243), max_workers=8)
+    result['best'], result['cost'] / result['full_cost']
+"""
+
+import math
+import random
+
+import numpy as np
+
+from .hyperparameters import declared
+
+DAY = 86_400_000
+
+
+def sample(cls, count, seed=0):
+    """
+    `count` random hyperparameter dicts in the ranges the strategy declares.
+    """
+    rng = random.Random(seed)
+    params = declared(cls)
+    population = []
+    for _ in range(count):
+        hp = {}
+        for p in params:
+            if p['type'] is int:
+                hp[p['name']] = rng.randint(p['min'], p['max'])
+            elif p['type'] is float:
+                hp[p['name']] = round(rng.uniform(p['min'], p['max']), 2)
+            else:
+                hp[p['name']] = rng.choice(p['options'])
+        population.append(hp)
+    return population
+
+
+def lengths(total, rungs=4, eta=3):
+    """
+    Window length of every rung, the last one being `total`.
+    """
+    return [max(total // eta ** (rungs - 1 - rung), 1) for rung in range(rungs)]
+
+
+def successive_halving(population, evaluate, lengths, eta=3, score=None):
+    """
+    Evaluates `population` on windows of `lengths` candles, keeping the best
+    1/`eta` of the candidates (at least one) from one rung to the next.
+    `evaluate(population, length)` returns one result per candidate and
+    `score(result)` ranks them, higher is better (a result of None is last).
+
+    Returns a dict with the best hyperparameters, the (score, hp, result)
+    tuples of the last rung from best to worst, the number of candidates
+    of every rung, and the candles the search evaluated against those of
+    evaluating every candidate over the last window.
+    """
+    score = score or (lambda result: result['net_profit'])
+    survivors = list(population)
+    ranked = []
+    counts = []
+    cost = 0
+    for rung, length in enumerate(lengths):
+        if rung:
+            survivors = [hp for _, hp, _ in ranked[:max(len(ranked) // eta, 1)]]
+        results = evaluate(survivors, length)
+        ranked = sorted(
+            ((-math.inf if result is None else score(result), hp, result) for hp, result in zip(survivors, results)),
+            key=lambda item: item[0], reverse=True,
+        )
+        counts.append(len(survivors))
+        cost += len(survivors) * length
+    return {
+        'best': ranked[0][1] if ranked else None,
+        'results': ranked,
+        'rungs': counts,
+        'cost': cost,
+        'full_cost': len(population) * lengths[-1],
+    }
+
+
+def window(candles, warmup_candles, minutes):
+    """
+    The candles and warmup candles (Jesse's candles dicts of one minute
+    candles) of a backtest over the last `minutes` candles, starting at the
+    beginning of a day. The warmup candles are the ones just before the
+    window, as many as in `warmup_candles`.
+    """
+    trading, warmup = {}, {}
+    for key, value in candles.items():
+        before = warmup_candles[key]['candles'] if warmup_candles else np.empty((0, 6))
+        history = np.concatenate([before, value['candles']])
+        first = max(len(history) - minutes, len(before))
+        # the window starts at the next day
+        first += int((-history[first, 0]) % DAY // 60_000)
+        trading[key] = {**value, 'candles': history[first:]}
+        warmup[key] = {**value, 'candles': history[first - len(before):first]}
+    return trading, warmup if warmup_candles else None
+
+
+def _metric(name):
+    def score(result):
+        if isinstance(result, Exception):
+            # hyperparameters the strategy cannot run with (e.g. an MA type that raises)
+            return -math.inf
+        return result['metrics'].get(name) or 0
+    return score
+
+
+def search_backtests(config, routes, data_routes, candles, warmup_candles, population, rungs=4, eta=3,
+                     metric='net_profit', max_workers=None, mp_context=None, cache_directory=None, **kwargs):
+    """
+    Successive halving of `population` with Jesse backtests (see
+    `jesse.research.backtest` for the other arguments), ranking the
+    candidates by `metric` of their backtest. The results are those of
+    `jesse.research.backtest`, or the exception a candidate raised.
+    """
+    from .workers import backtest_many
+
+    total = len(next(iter(candles.values()))['candles'])
+
+    def evaluate(survivors, minutes):
+        window_candles, window_warmup = window(candles, warmup_candles, minutes)
+        return backtest_many(config, routes, data_routes, window_candles, window_warmup, survivors,
+                             max_workers=max_workers, mp_context=mp_context, cache_directory=cache_directory,
+                             return_exceptions=True, **kwargs)
+
+    # whole days, so every window starts at the beginning of one
+    windows = [max(minutes // 1440, 1) * 1440 for minutes in lengths(total, rungs, eta)]
+    windows[-1] = total
+    return successive_halving(population, evaluate, windows, eta, score=_metric(metric))
@@ -0,0 +1,22 @@
+"""
+The hyperparameters a strategy class declares.
+
+`hyperparameters()` is an instance method, and creating a strategy needs
+Jesse's runtime. The tools that work on a strategy class (the grid search of
+MACD_EMA, shared/run_cache.py, shared/halving.py) read the declarations from
+an instance created without running its __init__.
+"""
+
+
+def declared(cls):
+    """
+    The list of hyperparameter dicts (name, type, min, max, default) of a strategy class.
+    """
+    return cls.__new__(cls).hyperparameters()
+
+
+def defaults(cls):
+    """
+    The default value of every hyperparameter of a strategy class, by name.
+    """
+    return {hp['name']: hp['default'] for hp in declared(cls)}
@@ -0,0 +1,82 @@
+"""
+Streaming Ichimoku cloud.
+
+Follows `jesse.indicators.ichimoku_cloud`, which only looks at the last 80
+candles: the conversion and base lines are the midpoints of the highest high
+and lowest low of their periods at the last candle, and the spans are read at
+the candle `displacement - 1` candles back. A span is NaN when its periods do
+not fit in the 80 candles window once displaced (or when displacement is
+below 2), and everything is NaN while there are fewer than 80 candles.
+
+The midpoints are kept with rolling extremes, and the spans of the last
+`displacement - 1` committed candles wait in a buffer until they are read.
+"""
+
+from collections import deque, namedtuple
+
+import numpy as np
+import jesse.indicators as ta
+
+from .rolling import StreamingDonchian
+from .streaming import StreamingIndicator
+
+IchimokuCloud = namedtuple('IchimokuCloud', ['conversion_line', 'base_line', 'span_a', 'span_b'])
+
+WINDOW = 80
+
+
+class StreamingIchimoku(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.ichimoku_cloud`.
+    """
+
+    def __init__(self, conversion_line_period=9, base_line_period=26, lagging_line_period=52, displacement=26):
+        super().__init__()
+        self.conversion_line_period = conversion_line_period
+        self.base_line_period = base_line_period
+        self.lagging_line_period = lagging_line_period
+        self.displacement = displacement
+
+        # candles the spans can use once displaced
+        available = WINDOW - (displacement - 1)
+        self.has_span_a = displacement >= 2 and max(conversion_line_period, base_line_period) <= available
+        self.has_span_b = displacement >= 2 and lagging_line_period <= available
+
+        self.conversion = StreamingDonchian(conversion_line_period)
+        self.base = StreamingDonchian(base_line_period)
+        self.lagging = StreamingDonchian(lagging_line_period) if self.has_span_b else None
+        # (span_a, span_b) of the last `displacement - 1` committed candles
+        self.spans = deque(maxlen=max(displacement - 1, 1))
+
+    def reset(self):
+        super().reset()
+        self.conversion.reset()
+        self.base.reset()
+        if self.lagging:
+            self.lagging.reset()
+        self.spans.clear()
+
+    def push(self, candle):
+        if self.has_span_a or self.has_span_b:
+            span_a = span_b = np.nan
+            if self.has_span_a:
+                span_a = (self.conversion.peek(candle).middleband + self.base.peek(candle).middleband) / 2
+            if self.has_span_b:
+                span_b = self.lagging.peek(candle).middleband
+                self.lagging.commit(candle)
+            self.spans.append((span_a, span_b))
+        self.conversion.commit(candle)
+        self.base.commit(candle)
+
+    def peek(self, candle):
+        if self.count + 1 < WINDOW:
+            return IchimokuCloud(np.nan, np.nan, np.nan, np.nan)
+
+        conversion_line = self.conversion.peek(candle).middleband if self.conversion_line_period <= WINDOW else np.nan
+        base_line = self.base.peek(candle).middleband if self.base_line_period <= WINDOW else np.nan
+        span_a, span_b = self.spans[0] if self.spans else (np.nan, np.nan)
+        return IchimokuCloud(conversion_line, base_line, span_a, span_b)
+
+    def batch(self, candles):
+        return ta.ichimoku_cloud(candles, self.conversion_line_period, self.base_line_period,
+                                 self.lagging_line_period, self.displacement)
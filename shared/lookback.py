@@ -0,0 +1,38 @@
+"""
+Trims the candles given to an indicator to the ones it actually needs.
+
+A strategy declares in `lookbacks()` how many candles each of its indicator
+properties needs (derived from its hyperparameters or vars), and the
+properties decorated with `@trimmed` receive only those last candles instead
+of the whole `self.candles`:
+
+    def lookbacks(self):
+        return {'slow_sma': self.vars['slow_sma_period']}
+
+    @property
+    @bar_cached
+    @trimmed
+    def slow_sma(self, candles):
+        return ta.sma(candles, self.vars['slow_sma_period'])
+
+Only windowed indicators (SMA, Bollinger Bands, KDJ, Ichimoku...) should be
+declared. The value of a recursive indicator like the EMA or the ATR depends
+on every candle it is given, so trimming its candles would change it; those
+keep getting `self.candles` (that Jesse already trims to `warmup_candles_num`
+candles for non sequential calls). Undeclared properties get `self.candles`
+too.
+"""
+
+import functools
+
+
+def trimmed(method):
+    @functools.wraps(method)
+    def wrapper(self):
+        candles = self.candles
+        lookback = self.lookbacks().get(method.__name__)
+        if lookback is not None:
+            candles = candles[-lookback:]
+        return method(self, candles)
+
+    return wrapper
@@ -0,0 +1,135 @@
+"""
+Opt-in profiling of a strategy's indicators and hooks.
+
+Decorate the strategy class with `@profiled`. Unless the STRATEGY_PROFILE
+environment variable is set when the strategy is imported, the decorator
+returns the class untouched, so it costs nothing and can stay in place.
+
+When enabled, every method and property the strategy defines (indicators,
+hooks, filters, helpers) is timed. Nested calls are tracked, so the time of
+`longExit` does not include the time of the `ma_slow` it reads. When Jesse
+calls `terminate()` at the end of the run, a summary with the calls per
+candle, microseconds per call and share of the total time of each member is
+printed, and the call stacks are saved in the folded format of flame graph
+tools (flamegraph.pl, speedscope, ...) in storage/profiles:
+
+    STRATEGY_PROFILE=1 jesse backtest ...
+"""
+
+import functools
+import os
+import time
+from collections import defaultdict
+from time import perf_counter_ns
+
+ENABLED = bool(os.environ.get('STRATEGY_PROFILE'))
+OUTPUT_DIRECTORY = 'storage/profiles'
+
+
+class Profile:
+    def __init__(self):
+        self.bars = 0
+        self.last_candle = None
+        self.total = 0
+        self.calls = defaultdict(int)
+        self.inclusive = defaultdict(int)
+        self.exclusive = defaultdict(int)
+        self.stacks = defaultdict(int)
+        self.stack = []
+        # time spent in the nested calls of each frame of the stack
+        self.nested = []
+
+    def call(self, name, f, strategy, args, kwargs):
+        if not self.stack:
+            timestamp = strategy.current_candle[0]
+            if timestamp != self.last_candle:
+                self.bars += 1
+                self.last_candle = timestamp
+
+        self.stack.append(name)
+        self.nested.append(0)
+        start = perf_counter_ns()
+        try:
+            return f(strategy, *args, **kwargs)
+        finally:
+            elapsed = perf_counter_ns() - start
+            own = elapsed - self.nested.pop()
+            self.stacks[tuple(self.stack)] += own
+            self.stack.pop()
+            self.calls[name] += 1
+            self.inclusive[name] += elapsed
+            self.exclusive[name] += own
+            if self.nested:
+                self.nested[-1] += elapsed
+            else:
+                self.total += elapsed
+
+    def summary(self, title):
+        bars = self.bars or 1
+        total = self.total or 1
+        lines = [
+            f'{title}: {self.bars} candles, {self.total / 1e6:.1f} ms in strategy code',
+            f'{"":<28}{"calls/bar":>10}{"us/call":>10}{"self us/call":>14}{"share":>8}',
+        ]
+        for name in sorted(self.exclusive, key=self.exclusive.get, reverse=True):
+            calls = self.calls[name]
+            lines.append(
+                f'{name:<28}{calls / bars:>10.2f}{self.inclusive[name] / calls / 1000:>10.2f}'
+                f'{self.exclusive[name] / calls / 1000:>14.2f}{self.exclusive[name] / total:>8.1%}'
+            )
+        return '\n'.join(lines)
+
+    def folded(self):
+        # microseconds of own time per call stack, one "a;b;c value" line each
+        return '\n'.join(f'{";".join(stack)} {ns // 1000}' for stack, ns in self.stacks.items())
+
+
+def profile_of(strategy):
+    if '_profile' not in strategy.__dict__:
+        strategy._profile = Profile()
+    return strategy._profile
+
+
+def _timed(name, f):
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        return profile_of(self).call(name, f, self, args, kwargs)
+
+    return wrapper
+
+
+def report(strategy):
+    profile = profile_of(strategy)
+    print(profile.summary(f'{type(strategy).__name__} profile'))
+    os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
+    path = os.path.join(OUTPUT_DIRECTORY, f'{type(strategy).__name__}-{time.strftime("%Y-%m-%dT%H-%M-%S")}.folded')
+    with open(path, 'w') as f:
+        f.write(profile.folded())
+    print(f'Call stacks saved to {path}')
+
+
+def profiled(cls):
+    """
+    Class decorator timing every method and property `cls` defines, when
+    profiling is enabled.
+    """
+    if not ENABLED:
+        return cls
+
+    for name, member in list(vars(cls).items()):
+        if name.startswith('__'):
+            continue
+        if isinstance(member, property):
+            setattr(cls, name, property(_timed(name, member.fget), member.fset, member.fdel, member.__doc__))
+        elif callable(member) and not isinstance(member, (staticmethod, classmethod, type)):
+            setattr(cls, name, _timed(name, member))
+
+    original_terminate = cls.terminate
+
+    @functools.wraps(original_terminate)
+    def terminate(self):
+        original_terminate(self)
+        report(self)
+
+    cls.terminate = terminate
+    return cls
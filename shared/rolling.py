@@ -0,0 +1,113 @@
+"""
+Rolling highest/lowest values in constant time per candle.
+
+A monotonic deque keeps only the candles that can still become the extreme of
+the window, so adding a candle is a couple of comparisons instead of slicing
+and reducing the last `period` values on every bar.
+"""
+
+from collections import deque, namedtuple
+
+import numpy as np
+import jesse.indicators as ta
+from jesse.helpers import get_candle_source
+
+from .streaming import StreamingIndicator, candle_source
+
+
+class RollingMax(StreamingIndicator):
+    """
+    Highest value of a candle source over the last `period` candles (the last
+    candle included). Like `np.max(source[-period:])`, it uses the available
+    candles when there are fewer than `period` of them.
+    """
+
+    def __init__(self, period, source_type="close"):
+        super().__init__()
+        self.period = period
+        self.source_type = source_type
+        # (index, value) pairs of the last `period - 1` committed candles, values decreasing
+        self.window = deque()
+
+    def reset(self):
+        super().reset()
+        self.window.clear()
+
+    @staticmethod
+    def dominates(a, b):
+        return a >= b
+
+    def push(self, candle):
+        value = candle_source(candle, self.source_type)
+        window = self.window
+        while window and self.dominates(value, window[-1][1]):
+            window.pop()
+        window.append((self.count, value))
+        # the peeked candle completes the window, so only `period - 1` committed candles are kept
+        while window and window[0][0] <= self.count - (self.period - 1):
+            window.popleft()
+
+    def peek(self, candle):
+        value = candle_source(candle, self.source_type)
+        if self.window and not self.dominates(value, self.window[0][1]):
+            return self.window[0][1]
+        return value
+
+    def batch(self, candles):
+        return np.max(get_candle_source(candles, self.source_type)[-self.period:])
+
+
+class RollingMin(RollingMax):
+    """
+    Lowest value of a candle source over the last `period` candles (the last
+    candle included).
+    """
+
+    @staticmethod
+    def dominates(a, b):
+        return a <= b
+
+    def batch(self, candles):
+        return np.min(get_candle_source(candles, self.source_type)[-self.period:])
+
+
+DonchianChannel = namedtuple('DonchianChannel', ['upperband', 'middleband', 'lowerband'])
+
+
+class StreamingDonchian(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.donchian`: highest high and lowest
+    low of the last `period` candles. Returns NaNs until `period` candles are
+    available, like the batch function. The channel at the last committed
+    candle is kept in `self.value`, so the previous candle's channel comes
+    with the update of the current one.
+    """
+
+    def __init__(self, period=20):
+        super().__init__()
+        self.period = period
+        self.highest = RollingMax(period, "high")
+        self.lowest = RollingMin(period, "low")
+        self.value = DonchianChannel(np.nan, np.nan, np.nan)
+
+    def reset(self):
+        super().reset()
+        self.highest.reset()
+        self.lowest.reset()
+        self.value = DonchianChannel(np.nan, np.nan, np.nan)
+
+    def push(self, candle):
+        self.value = self.peek(candle)
+        self.highest.commit(candle)
+        self.lowest.commit(candle)
+
+    def peek(self, candle):
+        if self.count + 1 < self.period:
+            return DonchianChannel(np.nan, np.nan, np.nan)
+
+        upper = self.highest.peek(candle)
+        lower = self.lowest.peek(candle)
+        return DonchianChannel(upper, (upper + lower) / 2, lower)
+
+    def batch(self, candles):
+        return ta.donchian(candles, self.period)
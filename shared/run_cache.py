@@ -0,0 +1,148 @@
+"""
+Cache of whole backtest results.
+
+Optimizations and walk-forward research run the same backtest again and
+again (a genetic population easily holds the same individual several times).
+`cached_backtest()` has the arguments of `jesse.research.backtest` and only
+runs it when no identical backtest ran before; otherwise it returns the
+stored result (metrics, trades and whatever else was generated).
+
+Two backtests are identical when they have the same:
+ - source code: the .py files of the strategies of the routes and of the
+   `shared` folder, and the Jesse version
+ - hyperparameters, once canonicalized: completed with the defaults of
+   the ones that are not given, values cast to the type the strategy
+   declares, and values that cannot change anything normalized by the
+   strategy's optional `canonical_hp(hp)` static method (see MAGen)
+ - candles: a hash of every candle array, warmup candles included
+ - config, routes and other arguments
+
+Results are pickled in a directory, one file per backtest named after the
+hash of all of the above, written aside and renamed so concurrent workers
+never read a partial file. Nothing is ever invalidated: a change of any of
+the inputs gives another file. Delete the directory to reclaim the space.
+
+Usage:
+    from shared.run_cache import cached_backtest
+    result = cached_backtest(config, routes, data_routes, candles, warmup_candles, hyperparameters=hp)
+
+`shared/workers.py`'s `backtest_many(..., cache_directory=...)` goes through
+it too, and runs the duplicates of a batch only once.
+"""
+
+import hashlib
+import importlib.metadata
+import inspect
+import json
+import os
+import pickle
+
+import numpy as np
+import jesse.helpers as jh
+
+from .hyperparameters import declared, defaults
+
+DIRECTORY = 'storage/run-cache'
+
+# source hash of each strategy class, computed once per process
+_sources = {}
+
+
+def source_hash(cls):
+    """
+    Hash of the .py files of the strategy's folder and of the `shared` folder.
+    """
+    if cls not in _sources:
+        import shared
+
+        digest = hashlib.sha256(importlib.metadata.version('jesse').encode())
+        for directory in (os.path.dirname(inspect.getfile(cls)), os.path.dirname(shared.__file__)):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.py'):
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        digest.update(name.encode())
+                        digest.update(f.read())
+        _sources[cls] = digest.hexdigest()
+    return _sources[cls]
+
+
+def canonical_hp(cls, hp):
+    """
+    The hyperparameters the strategy actually runs with, normalized so
+    equivalent dicts are equal.
+    """
+    types = {p['name']: p['type'] for p in declared(cls)}
+    # Jesse runs with the defaults when hp is None or empty. Partial dicts are completed with them too,
+    # so the same backtest always has the same key.
+    hp = {**defaults(cls), **(hp or {})}
+    for name, value in hp.items():
+        kind = types.get(name)
+        if kind in (int, float):
+            hp[name] = kind(value)
+    if hasattr(cls, 'canonical_hp'):
+        hp = cls.canonical_hp(hp)
+    return hp
+
+
+def fingerprint(*candle_dicts):
+    """
+    Hash of the candle arrays of Jesse's candles dicts.
+    """
+    digest = hashlib.sha256()
+    for candles in candle_dicts:
+        for key in sorted(candles or {}):
+            digest.update(key.encode())
+            digest.update(np.ascontiguousarray(candles[key]['candles'], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def run_key(config, routes, data_routes, hyperparameters, dataset, kwargs):
+    """
+    Hash of everything a backtest result depends on. `dataset` is the
+    `fingerprint` of its candles.
+    """
+    classes = [jh.get_strategy_class(route['strategy']) for route in routes]
+    payload = {
+        'sources': [source_hash(cls) for cls in classes],
+        'hp': [canonical_hp(cls, hyperparameters) for cls in classes],
+        'dataset': dataset,
+        'config': config,
+        'routes': routes,
+        'data_routes': data_routes,
+        'kwargs': kwargs,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+def load(key, directory=DIRECTORY):
+    path = os.path.join(directory, f'{key}.pickle')
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def store(key, result, directory=DIRECTORY):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{key}.pickle')
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def cached_backtest(config, routes, data_routes, candles, warmup_candles=None, hyperparameters=None,
+                    directory=DIRECTORY, **kwargs):
+    """
+    `jesse.research.backtest`, or its stored result when the same backtest already ran.
+    """
+    from jesse.research import backtest
+
+    key = run_key(config, routes, data_routes, hyperparameters, fingerprint(candles, warmup_candles), kwargs)
+    result = load(key, directory)
+    if result is None:
+        result = backtest(config, routes, data_routes, candles, warmup_candles, hyperparameters=hyperparameters,
+                          **kwargs)
+        store(key, result, directory)
+    return result
@@ -0,0 +1,125 @@
+"""
+Screens many symbols at once for strategies whose entry rules only depend on
+the candles of the symbol.
+
+The candles of every symbol are stacked into one (symbols x candles x 6)
+array aligned on timestamps, and the strategy's `screen_signals` static
+method (see TurtleRules, Donchian and RSI2) evaluates its should_long and
+should_short rules at the last candle for all the symbols with a few NumPy
+operations, instead of one backtest per symbol. Missing candles (symbols
+listed later, gaps, stale symbols) are NaN and never produce a signal.
+
+Rules that depend on the strategy's state (like TurtleRules' S1 filter,
+which depends on the previous trade) cannot be screened and are left out.
+
+Example:
+    from shared import screener
+    candles = screener.load_candles('Binance Spot', symbols, '1D', start, finish)
+    signals = screener.screen('TurtleRules', candles, '1D')
+    signals['long']  # symbols with a long entry signal on the last candle
+"""
+
+import importlib
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import jesse.helpers as jh
+
+Screen = namedtuple('Screen', ['long', 'short'])
+
+
+def load_candles(exchange, symbols, timeframe, start_date_timestamp, finish_date_timestamp, warmup_candles_num=240):
+    """
+    Candles of every symbol from Jesse's database, warmup candles included,
+    as a dict of symbol -> candles. Symbols without candles are skipped with
+    a warning.
+    """
+    from jesse.research import get_candles
+
+    result = {}
+    for symbol in symbols:
+        try:
+            warmup, candles = get_candles(exchange, symbol, timeframe, start_date_timestamp, finish_date_timestamp,
+                                          warmup_candles_num)
+        except Exception as e:
+            warnings.warn(f'Skipping {symbol}: {e}')
+            continue
+        result[symbol] = np.concatenate([warmup, candles]) if len(warmup) else candles
+    return result
+
+
+def stack(candles_by_symbol, timeframe, bars=240):
+    """
+    Stacks the last `bars` candles of every symbol into a (symbols x bars x 6)
+    array. The candles are placed by timestamp on a common axis that ends
+    with the most recent candle of all the symbols; missing candles are NaN.
+    Returns the list of symbols and the array.
+    """
+    symbols = list(candles_by_symbol)
+    period = jh.timeframe_to_one_minutes(timeframe) * 60_000
+    last = max(candles[-1, 0] for candles in candles_by_symbol.values())
+    first = last - (bars - 1) * period
+
+    stacked = np.full((len(symbols), bars, 6), np.nan)
+    for row, symbol in enumerate(symbols):
+        candles = candles_by_symbol[symbol]
+        candles = candles[candles[:, 0] >= first]
+        stacked[row, ((candles[:, 0] - first) // period).astype(int)] = candles
+    return symbols, stacked
+
+
+def sma(values, period):
+    """
+    Simple moving average of the last `period` values of every row.
+    """
+    return values[:, -period:].mean(axis=1)
+
+
+def rsi(values, period=14):
+    """
+    RSI (Wilder's smoothing, like `jesse.indicators.rsi`) at the last value of
+    every row, over all the values of the row. NaN values (missing candles)
+    are skipped.
+    """
+    symbols, size = values.shape
+    gain = np.zeros(symbols)
+    loss = np.zeros(symbols)
+    changes = np.zeros(symbols, dtype=int)
+    previous = values[:, 0]
+    for i in range(1, size):
+        current = values[:, i]
+        change = current - previous
+        valid = ~np.isnan(change)
+        up = np.where(valid, np.maximum(change, 0), 0)
+        down = np.where(valid, np.maximum(-change, 0), 0)
+        changes += valid
+        seeding = valid & (changes <= period)
+        smoothing = valid & (changes > period)
+        gain = np.where(seeding, gain + up, np.where(smoothing, (gain * (period - 1) + up) / period, gain))
+        loss = np.where(seeding, loss + down, np.where(smoothing, (loss * (period - 1) + down) / period, loss))
+        # the seed is the average of the first `period` changes
+        seeded = valid & (changes == period)
+        gain = np.where(seeded, gain / period, gain)
+        loss = np.where(seeded, loss / period, loss)
+        previous = np.where(np.isnan(current), previous, current)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+    return np.where(changes >= period, result, np.nan)
+
+
+def screen(strategy, candles_by_symbol, timeframe, bars=240):
+    """
+    Symbols with a long or short entry signal on the last candle, as a dict
+    with 'long' and 'short' lists. `strategy` is a strategy class or the name
+    of an importable strategy module.
+    """
+    if isinstance(strategy, str):
+        strategy = getattr(importlib.import_module(strategy), strategy)
+    symbols, stacked = stack(candles_by_symbol, timeframe, bars)
+    signals = strategy.screen_signals(stacked)
+    return {
+        'long': [s for s, signal in zip(symbols, signals.long) if signal],
+        'short': [s for s, signal in zip(symbols, signals.short) if signal],
+    }
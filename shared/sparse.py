@@ -0,0 +1,62 @@
+"""
+Sparse execution: only call the strategy's hooks on the candles where
+something can happen.
+
+A breakout strategy that is flat can only enter on a candle where price
+crosses its channel or thrust level, and an open position can only be
+closed when its exit condition fires or its stop/take profit is reached.
+Such a strategy exposes a `candidate_bars(candles, timeframe, hp)` static
+method (see Donchian, TurtleRules and DUAL_THRUST) that returns, computed
+once for all the candles with NumPy:
+
+ - `entry`: the candles where should_long or should_short can be true
+ - `exit`: the candles where update_position can act on an open position
+
+The engine of shared/benchmark.py (`StubEngine(..., sparse=True)` or
+`python -m shared.benchmark --sparse`) skips every other candle, except that
+it checks the stop and take profit of an open position on each candle
+itself. The candidates only have to contain every candle where the hooks
+would act: they can be a superset (e.g. Donchian ignores its trend filter,
+which the strategy still checks), so rounding differences between the
+vectorized and the streaming indicators cannot make the engine skip a
+trade. The strategy's indicators catch up with the skipped candles the next
+time they are read (see shared/streaming.py).
+
+This is only valid for strategies that do not change their state on candles
+where they do not act, which is the case of the three above. `compare()`
+runs a strategy both ways and checks the trades are the same.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+Candidates = namedtuple('Candidates', ['entry', 'exit'])
+
+
+def candidates(cls, candles, timeframe, hp=None):
+    """
+    Candidate candles of a strategy class, every candle when it has no `candidate_bars`.
+    """
+    if not hasattr(cls, 'candidate_bars'):
+        every = np.ones(len(candles), dtype=bool)
+        return Candidates(every, every)
+    return cls.candidate_bars(candles, timeframe, hp or {})
+
+
+def compare(cls, candles, timeframe, hp=None, **kwargs):
+    """
+    Runs `cls` over `candles` with the stand-in engine of shared/benchmark.py
+    calling the hooks on every candle and only on the candidate ones. Raises
+    a ValueError when the trades differ, otherwise returns the fraction of
+    candles that were skipped.
+    """
+    from .benchmark import StubEngine
+
+    dense = StubEngine(cls, candles, timeframe, hp, **kwargs).run()
+    sparse = StubEngine(cls, candles, timeframe, hp, sparse=True, **kwargs).run()
+    if dense.events != sparse.events:
+        first = next(i for i, (a, b) in enumerate(zip(dense.events + [None], sparse.events + [None])) if a != b)
+        raise ValueError(f'{cls.__name__}: sparse trades differ from event {first}: '
+                         f'{dense.events[first:first + 1]} (every candle) != {sparse.events[first:first + 1]} (sparse)')
+    return sparse.skipped / (len(candles) - sparse.warmup)
@@ -0,0 +1,77 @@
+"""
+Streaming KDJ.
+
+Follows `jesse.indicators.kdj` with simple moving averages (the default
+matypes): the stochastic of each candle over the highest high and lowest low
+of the last `fastk_period` candles, K its SMA and D the SMA of K, J = 3K - 2D.
+Like Jesse's SMA, the averages skip NaN values (the stochastic is NaN when the
+window has no range at all) and are NaN until `period` values are available.
+"""
+
+from collections import deque, namedtuple
+
+import numpy as np
+import jesse.indicators as ta
+
+from .rolling import RollingMax, RollingMin
+from .streaming import StreamingIndicator
+
+KDJ = namedtuple('KDJ', ['k', 'd', 'j'])
+
+
+def nan_mean(values):
+    valid = [v for v in values if v == v]
+    return sum(valid) / len(valid) if valid else np.nan
+
+
+class StreamingKDJ(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.kdj`. The KDJ at the last committed
+    candle is kept in `self.value`, so the previous candle's values come with
+    the update of the current one.
+    """
+
+    def __init__(self, fastk_period=9, slowk_period=3, slowd_period=3):
+        super().__init__()
+        self.fastk_period = fastk_period
+        self.slowk_period = slowk_period
+        self.slowd_period = slowd_period
+        self.highest = RollingMax(fastk_period, "high")
+        self.lowest = RollingMin(fastk_period, "low")
+        # stochastic and K values of the last committed candles
+        self.stochs = deque(maxlen=slowk_period - 1)
+        self.ks = deque(maxlen=slowd_period - 1)
+        self.value = KDJ(np.nan, np.nan, np.nan)
+
+    def reset(self):
+        super().reset()
+        self.highest.reset()
+        self.lowest.reset()
+        self.stochs.clear()
+        self.ks.clear()
+        self.value = KDJ(np.nan, np.nan, np.nan)
+
+    def step(self, candle):
+        """
+        Returns the stochastic and the KDJ at `candle` (the candle at index `self.count`).
+        """
+        highest, lowest = self.highest.peek(candle), self.lowest.peek(candle)
+        stoch = 100 * (candle[2] - lowest) / (highest - lowest) if highest != lowest else np.nan
+
+        index = self.count
+        k = nan_mean([*self.stochs, stoch]) if index >= self.slowk_period - 1 else np.nan
+        d = nan_mean([*self.ks, k]) if index >= self.slowd_period - 1 else np.nan
+        return stoch, KDJ(k, d, 3 * k - 2 * d)
+
+    def push(self, candle):
+        stoch, self.value = self.step(candle)
+        self.stochs.append(stoch)
+        self.ks.append(self.value.k)
+        self.highest.commit(candle)
+        self.lowest.commit(candle)
+
+    def peek(self, candle):
+        return self.step(candle)[1]
+
+    def batch(self, candles):
+        return ta.kdj(candles, self.fastk_period, self.slowk_period, slowd_period=self.slowd_period)
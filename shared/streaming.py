@@ -0,0 +1,171 @@
+"""
+Base class for indicators that are updated one candle at a time.
+
+Jesse hands the strategy the whole candle history on every bar, and the batch
+`jesse.indicators` functions process (a slice of) that history on every call.
+A streaming indicator instead keeps a small state and only looks at the candles
+it has not seen yet, so its per-bar cost does not depend on how much history is
+loaded.
+
+The state is "committed" up to the second to last candle. The last candle is
+only "peeked": its value is computed from the committed state without changing
+it. This way the same object can be queried while the last candle is still
+forming (e.g. inside on_increased_position) and again once it has closed.
+
+Usage inside a strategy:
+    @property
+    @bar_cached
+    def highest_close(self):
+        return get_state(self, RollingMax, 20, "close").update(self.candles)
+
+Set `StreamingIndicator.verify = True` to compare every streamed value with the
+equivalent batch `jesse.indicators` call. It is slow, but proves the streaming
+version produces the same values.
+"""
+
+import numpy as np
+
+
+def candle_source(candle, source_type="close"):
+    """
+    Same as `jesse.helpers.get_candle_source` but for a single candle.
+    Candle columns: 0 -> timestamp, 1 -> open, 2 -> close, 3 -> high, 4 -> low, 5 -> volume
+    """
+    if source_type == "close":
+        return candle[2]
+    if source_type == "high":
+        return candle[3]
+    if source_type == "low":
+        return candle[4]
+    if source_type == "open":
+        return candle[1]
+    if source_type == "volume":
+        return candle[5]
+    if source_type == "hl2":
+        return (candle[3] + candle[4]) / 2
+    if source_type == "hlc3":
+        return (candle[3] + candle[4] + candle[2]) / 3
+    if source_type == "ohlc4":
+        return (candle[1] + candle[3] + candle[4] + candle[2]) / 4
+    raise ValueError(f'type string not recognised: {source_type}')
+
+
+class StreamingIndicator:
+    verify = False
+
+    def __init__(self):
+        self.last_timestamp = None
+        # number of committed candles
+        self.count = 0
+
+    def reset(self):
+        """
+        Clears the state. Subclasses extend it to clear their own state and
+        must call super().reset().
+        """
+        self.last_timestamp = None
+        self.count = 0
+
+    def push(self, candle):
+        """
+        Commits a closed candle to the state.
+        """
+        raise NotImplementedError
+
+    def commit(self, candle):
+        """
+        Pushes a closed candle and counts it. Indicators composed of other
+        streaming indicators commit the candle to each of them.
+        """
+        self.push(candle)
+        self.count += 1
+
+    def peek(self, candle):
+        """
+        Returns the value of the indicator at `candle` without committing it.
+        """
+        raise NotImplementedError
+
+    def batch(self, candles):
+        """
+        Returns the value of the equivalent batch jesse indicator at the last
+        candle. Only used to verify the streaming version.
+        """
+        raise NotImplementedError
+
+    def update(self, candles):
+        """
+        Commits every candle except the last one that has not been seen yet,
+        and returns the value of the indicator at the last candle.
+        """
+        self.sync(candles[:-1])
+        value = self.peek(candles[-1])
+        if self.verify:
+            check(self, value, self.batch(candles), candles[-1, 0])
+        return value
+
+    def sync(self, candles):
+        """
+        Commits every candle that has not been seen yet. Starts over from the
+        whole array when it does not continue the committed history (e.g. a new
+        backtest reusing the object, or candles that were dropped from the store).
+        """
+        if not len(candles):
+            return
+
+        last_timestamp = self.last_timestamp
+        if last_timestamp is not None and candles[-1, 0] == last_timestamp:
+            # nothing new to commit
+            return
+
+        start = len(candles)
+        if last_timestamp is not None:
+            # usually a single step back: only one new candle closed since the last call
+            while start > 0 and candles[start - 1, 0] > last_timestamp:
+                start -= 1
+        if last_timestamp is None or start == 0 or candles[start - 1, 0] != last_timestamp:
+            self.reset()
+            start = 0
+
+        for i in range(start, len(candles)):
+            self.commit(candles[i])
+        self.last_timestamp = candles[-1, 0]
+
+
+def get_state(strategy, cls, *args):
+    """
+    Returns the streaming indicator `cls(*args)` that belongs to the strategy,
+    creating it on first use. Indicators created with the same arguments are
+    shared, so e.g. two properties using the same rolling window are only
+    updated once per candle.
+    """
+    states = strategy.__dict__.setdefault('_streaming_states', {})
+    key = (cls, *args)
+    state = states.get(key)
+    if state is None:
+        state = states[key] = cls(*args)
+    return state
+
+
+def check(indicator, value, expected, timestamp):
+    """
+    Raises a ValueError when a streamed value does not match the batch one.
+    """
+    if not np.allclose(np.asarray(value, dtype=float), np.asarray(expected, dtype=float),
+                       rtol=1e-7, atol=1e-9, equal_nan=True):
+        raise ValueError(
+            f'{type(indicator).__name__} differs from the batch indicator at {timestamp}: '
+            f'{value} (streaming) != {expected} (batch)'
+        )
+
+
+def verify(indicator, candles, start=1):
+    """
+    Resets `indicator`, replays `candles` through it one candle at a time
+    and compares every value with the batch indicator. Raises a ValueError on
+    the first mismatch.
+    """
+    indicator.reset()
+    for i in range(start, len(candles) + 1):
+        window = candles[:i]
+        check(indicator, indicator.update(window), indicator.batch(window), window[-1, 0])
@@ -0,0 +1,64 @@
+"""
+Higher timeframe candles built from the candles of the trading timeframe.
+
+`self.get_candles(exchange, symbol, timeframe)` returns the whole candle
+history of the other timeframe on every bar even when a strategy only needs
+the candle that is forming, e.g. its open. The resampler aggregates the
+candles of the trading timeframe into the forming higher timeframe candle as
+they close instead, so reading it costs the same at every bar.
+
+Higher timeframe candles start at multiples of their length since the epoch,
+like Jesse's. The first one is only complete when the candles of the trading
+timeframe start at its beginning, which does not matter once past the warmup
+candles.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import jesse.helpers as jh
+
+from .streaming import StreamingIndicator
+
+Candle = namedtuple('Candle', ['timestamp', 'open', 'close', 'high', 'low', 'volume'])
+
+EMPTY = Candle(np.nan, np.nan, np.nan, np.nan, np.nan, np.nan)
+
+
+class StreamingResampler(StreamingIndicator):
+    """
+    Forming candle of `timeframe` at the last candle: its open is that of the
+    first candle of the period, its close that of the last candle, and so on.
+
+    Usage inside a strategy:
+        get_state(self, StreamingResampler, utils.anchor_timeframe(self.timeframe)).update(self.candles).open
+    """
+
+    def __init__(self, timeframe):
+        super().__init__()
+        self.timeframe = timeframe
+        self.period = jh.timeframe_to_one_minutes(timeframe) * 60_000
+        # higher timeframe candle of the committed candles of the current period
+        self.forming = EMPTY
+
+    def reset(self):
+        super().reset()
+        self.forming = EMPTY
+
+    def push(self, candle):
+        self.forming = self.peek(candle)
+
+    def peek(self, candle):
+        forming = self.forming
+        start = candle[0] // self.period * self.period
+        if forming.timestamp != start:
+            # the candle starts a new period
+            return Candle(start, candle[1], candle[2], candle[3], candle[4], candle[5])
+
+        return Candle(start, forming.open, candle[2], max(forming.high, candle[3]), min(forming.low, candle[4]),
+                      forming.volume + candle[5])
+
+    def batch(self, candles):
+        start = candles[-1, 0] // self.period * self.period
+        period = candles[candles[:, 0] >= start]
+        return Candle(start, period[0, 1], period[-1, 2], period[:, 3].max(), period[:, 4].min(), period[:, 5].sum())
@@ -0,0 +1,245 @@
+"""
+Indicator series shared by all the trials an optimization worker runs, and
+kept on disk between runs.
+
+During an optimization every trial backtests the same candles, and most
+indicator parameter combinations come up again and again. `cached_series()`
+keeps the sequential series of an indicator (keyed by the dataset and the
+indicator parameters) in a memory bounded LRU cache that lives as long as the
+worker process, so a trial that uses parameters an earlier trial already used
+gets its series by slicing instead of computing it.
+
+It is only valid for causal indicators (the value at a candle only depends on
+the candles up to that one), which is the case of `ta.ma` and friends with
+`sequential=True`: the series computed over the whole dataset is sliced to the
+candles of the current bar.
+
+Each series is stored with a checksum of every candle it was computed from,
+and is only used for candles whose checksums match: the whole history the
+first time a process uses it, then the new candles of each bar. So a series
+is never reused for different candles, even when they were re-imported or
+the last candle was still forming when the series was computed.
+
+With a directory, series are also saved as .npz files (when evicted from
+memory, when a backtest ends and when the process exits) and loaded from
+there by any later run or other worker process:
+    from shared import trial_cache
+    trial_cache.configure(directory='storage/indicator-cache', disk_max_bytes=4 * 2 ** 30)
+Files are written aside and renamed, so a reader never sees a partial file,
+and the least recently used ones are deleted when the directory grows over
+`disk_max_bytes`.
+
+`cached_indicator()` does the same for code that works on a whole candle
+array at once (the vectorized evaluators), keyed by a hash of the array.
+"""
+
+import atexit
+import hashlib
+import os
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+# one odd multiplier per candle column, so swapping two values changes the checksum
+MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                        0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53], dtype=np.uint64)
+
+
+def checksums(candles):
+    """
+    A 64 bits checksum of every candle.
+    """
+    bits = np.ascontiguousarray(candles, dtype=np.float64).view(np.uint64)
+    with np.errstate(over='ignore'):
+        return (bits * MULTIPLIERS[:bits.shape[1]]).sum(axis=1, dtype=np.uint64)
+
+
+class Entry:
+    def __init__(self, series, sums, verified, dirty):
+        self.series = series
+        # checksums of the candles the series was computed from
+        self.sums = sums
+        # number of candles checked against the candles of this process
+        self.verified = verified
+        # not saved to the directory yet
+        self.dirty = dirty
+
+    @property
+    def nbytes(self):
+        return self.series.nbytes + self.sums.nbytes
+
+    def matches(self, candles):
+        """
+        Number of the first candles of `candles` the series was computed
+        from: all of them or as many as the series has, or 0 when any of
+        them differs. Only the candles not checked yet are checksummed.
+        """
+        length = min(len(candles), len(self.sums))
+        # the candle the series ended on may have been forming, so it is checked again
+        start = max(min(self.verified, length) - 1, 0)
+        if not np.array_equal(self.sums[start:length], checksums(candles[start:length])):
+            return 0
+        self.verified = max(self.verified, length)
+        return length
+
+
+class SeriesCache:
+    def __init__(self, max_bytes=256 * 2 ** 20, directory=None, disk_max_bytes=2 * 2 ** 30, compress=False):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.compress = compress
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, candles, compute):
+        """
+        Returns `compute(candles)`, reusing the series stored under `key` when
+        it already covers `candles`.
+        """
+        entry = self.entries.get(key)
+        if entry is None and self.directory:
+            entry = self._load(key)
+        matched = entry.matches(candles) if entry is not None else 0
+        if matched == len(candles):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry.series[:len(candles)]
+
+        self.misses += 1
+        series = compute(candles)
+        if matched:
+            # the series ends before `candles` (during the first trial, every bar adds a candle):
+            # only the new candles need a checksum
+            sums = np.concatenate([entry.sums[:matched], checksums(candles[matched:])])
+        else:
+            sums = checksums(candles)
+        self._store(key, Entry(series, sums, len(candles), dirty=True))
+        return series
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def flush(self):
+        """
+        Saves the series that are not in the directory yet.
+        """
+        if not self.directory:
+            return
+        for key, entry in self.entries.items():
+            if entry.dirty:
+                self._save(key, entry)
+        self._trim()
+
+    def _store(self, key, entry):
+        if key in self.entries:
+            self.size -= self.entries.pop(key).nbytes
+        self.entries[key] = entry
+        self.size += entry.nbytes
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.nbytes
+            if self.directory and evicted.dirty:
+                self._save(evicted_key, evicted)
+                self._trim()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.npz')
+
+    def _save(self, key, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # write to a temporary file first so other workers never read a partial file
+        temporary = f'{path}.{os.getpid()}.tmp'
+        save = np.savez_compressed if self.compress else np.savez
+        with open(temporary, 'wb') as f:
+            save(f, series=entry.series, sums=entry.sums)
+        os.replace(temporary, path)
+        entry.dirty = False
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                entry = Entry(data['series'], data['sums'], 0, dirty=False)
+            # most recently used, for the eviction of the directory
+            os.utime(path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # missing, deleted by another worker meanwhile, or unreadable: computed again
+            return None
+        self._store(key, entry)
+        return entry
+
+    def _trim(self):
+        """
+        Deletes the least recently used files while the directory is bigger than `disk_max_bytes`.
+        """
+        files = []
+        with os.scandir(self.directory) as it:
+            for f in it:
+                if f.name.endswith('.npz'):
+                    try:
+                        stat = f.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, f.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # already deleted by another worker
+                pass
+            total -= size
+
+
+cache = SeriesCache()
+atexit.register(cache.flush)
+
+
+def configure(max_bytes=None, directory=None, disk_max_bytes=None, compress=None):
+    """
+    Changes the size limit of the worker's cache, the directory series are
+    saved to, its size limit and whether the files are compressed.
+    """
+    if max_bytes is not None:
+        cache.max_bytes = max_bytes
+    if directory is not None:
+        cache.directory = directory
+    if disk_max_bytes is not None:
+        cache.disk_max_bytes = disk_max_bytes
+    if compress is not None:
+        cache.compress = compress
+
+
+def flush():
+    """
+    Saves the series computed since the last flush to the directory, if any.
+    Strategies call it when a backtest ends.
+    """
+    cache.flush()
+
+
+def cached_series(strategy, name, params, compute):
+    """
+    Returns `compute(strategy.candles)` through the worker's cache. The key is
+    the route, the first candle of the dataset, `name` and `params`.
+    """
+    candles = strategy.candles
+    key = (strategy.exchange, strategy.symbol, strategy.timeframe, tuple(candles[0].tolist()), name, params)
+    return cache.get(key, candles, compute)
+
+
+def cached_indicator(candles, name, params, compute):
+    """
+    Returns `compute(candles)` through the worker's cache, keyed by a hash of
+    the whole candle array, `name` and `params`.
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(candles, dtype=np.float64).tobytes()).hexdigest()
+    return cache.get((digest, name, params), candles, compute)
@@ -0,0 +1,275 @@
+"""
+Vectorized backtests for strategies whose rules only depend on the indicator
+values of the current candle.
+
+Instead of driving the strategy candle by candle through should_long and
+update_position, such a strategy exposes its entry and exit rules as boolean
+NumPy arrays computed once over the whole candle history (see the
+`vectorized_signals` static methods of SMACrossover, Donchian and
+SimpleBollinger). `simulate()` turns those arrays into positions, fills and
+PNL the same way Jesse would execute the strategy:
+
+ - rules are checked at the close of each candle and market orders are filled
+   at the closing price
+ - an open position is checked for an exit first, and a new position can be
+   opened on the same candle the previous one was closed
+ - the entire balance is used for each position (like
+   `utils.size_to_qty(self.balance, self.price, fee_rate=self.fee_rate)`)
+ - a position still open at the end is closed at the last closing price
+
+`parity_check()` runs the same strategy through `jesse.research.backtest` and
+compares the trades, to make sure the vectorized rules match the event driven
+ones.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from jesse import utils
+import jesse.helpers as jh
+
+Signals = namedtuple('Signals', ['long_entry', 'long_exit', 'short_entry', 'short_exit'])
+
+
+def signals(long_entry, long_exit, short_entry=None, short_exit=None):
+    """
+    Builds a Signals tuple, using "never" for the rules a long-only strategy does not have.
+    """
+    never = np.zeros(len(long_entry), dtype=bool)
+    return Signals(
+        np.asarray(long_entry, dtype=bool),
+        np.asarray(long_exit, dtype=bool),
+        never if short_entry is None else np.asarray(short_entry, dtype=bool),
+        never if short_exit is None else np.asarray(short_exit, dtype=bool),
+    )
+
+
+def previous(values):
+    """
+    Shifts a series by one candle: the value of the previous candle at every index.
+    """
+    return jh.np_shift(np.asarray(values, dtype=float), 1, np.nan)
+
+
+def rolling_mid(candles, period):
+    """
+    (highest high + lowest low) / 2 of the last `period` candles, for every candle.
+    NaN until `period` candles are available.
+    """
+    result = np.full(len(candles), np.nan)
+    if len(candles) >= period:
+        highs = np.lib.stride_tricks.sliding_window_view(candles[:, 3], period).max(axis=1)
+        lows = np.lib.stride_tricks.sliding_window_view(candles[:, 4], period).min(axis=1)
+        result[period - 1:] = (highs + lows) / 2
+    return result
+
+
+class RangeExtremes:
+    """
+    Sparse table over a series: after an O(N log N) setup, the rolling min/max
+    of any window length up to `max_length` is two array lookups, so many
+    window lengths (e.g. a whole hyperparameter range) can be queried without
+    reducing the windows over and over. Like `np.max(values[-length:])` at
+    every index, windows are shorter at the start of the series.
+    """
+
+    def __init__(self, values, max_length):
+        values = np.asarray(values, dtype=float)
+        self.size = len(values)
+        self.max_length = max_length
+        self.pad = max_length - 1
+        # level k holds the extremes of the 2 ** k values starting at each index
+        self.maxs = [np.concatenate([np.full(self.pad, -np.inf), values])]
+        self.mins = [np.concatenate([np.full(self.pad, np.inf), values])]
+        k = 1
+        while 2 ** k <= max_length:
+            half = 2 ** (k - 1)
+            self.maxs.append(np.maximum(self.maxs[-1][:-half], self.maxs[-1][half:]))
+            self.mins.append(np.minimum(self.mins[-1][:-half], self.mins[-1][half:]))
+            k += 1
+
+    def _query(self, levels, reduce, length):
+        if not 1 <= length <= self.max_length:
+            raise ValueError(f'length must be between 1 and {self.max_length}, {length} was given.')
+        k = length.bit_length() - 1
+        table = levels[k]
+        # two (overlapping) blocks of 2 ** k values cover the window ending at each index
+        first = self.pad - length + 1
+        second = self.pad - 2 ** k + 1
+        return reduce(table[first:first + self.size], table[second:second + self.size])
+
+    def max(self, length):
+        return self._query(self.maxs, np.maximum, length)
+
+    def min(self, length):
+        return self._query(self.mins, np.minimum, length)
+
+
+def ichimoku_spans(candles, conversion_line_period=9, base_line_period=26, lagging_line_period=52, displacement=26):
+    """
+    span_a and span_b of `jesse.indicators.ichimoku_cloud` for every candle.
+
+    The batch indicator only looks at the last 80 candles and reads the spans of
+    the candle `displacement - 1` candles ago, so a span is NaN when its period
+    does not fit in those 80 candles (and for the first 79 candles).
+    """
+    size = len(candles)
+    span_a = np.full(size, np.nan)
+    span_b = np.full(size, np.nan)
+    if size < 80:
+        return span_a, span_b
+
+    # index of the displaced candle inside the 80 candles window
+    index = 79 - (displacement - 1)
+    shift = displacement - 1
+    if index - max(conversion_line_period, base_line_period) + 1 >= 0:
+        a = (rolling_mid(candles, conversion_line_period) + rolling_mid(candles, base_line_period)) / 2
+        span_a[79:] = a[79 - shift:size - shift]
+    if index - lagging_line_period + 1 >= 0:
+        b = rolling_mid(candles, lagging_line_period)
+        span_b[79:] = b[79 - shift:size - shift]
+    return span_a, span_b
+
+
+def forming_candle_open(candles, timeframe):
+    """
+    Open price of the `timeframe` candle each candle belongs to, i.e. what
+    `self.get_candles(exchange, symbol, timeframe)[:, 1][-1]` returns at the
+    close of every candle of a lower timeframe.
+    """
+    period = jh.timeframe_to_one_minutes(timeframe) * 60_000
+    blocks = candles[:, 0] // period
+    # index of the first candle of each block, repeated for every candle of the block
+    starts = np.flatnonzero(np.r_[True, blocks[1:] != blocks[:-1]])
+    first = np.repeat(starts, np.diff(np.r_[starts, len(candles)]))
+    return candles[first, 1]
+
+
+def simulate(candles, signals, start=0, starting_balance=10_000, fee_rate=0, precision=3):
+    """
+    Executes the entry/exit arrays over `candles` (the candles of the trading
+    timeframe, warmup candles included) starting at index `start`.
+
+    Returns a dict with the list of trades (in the same shape as the trades of
+    `jesse.research.backtest`, plus the entry/exit indexes), the position of
+    every candle (1 long, -1 short, 0 flat), the equity at every close, the
+    net profit and the number of trades.
+    """
+    if np.any(signals.long_entry[start:] & signals.short_entry[start:]):
+        raise ValueError('long_entry and short_entry should not be true at the same time.')
+
+    closes = candles[:, 2]
+    # only the candles where something can happen are visited
+    entries = np.flatnonzero(signals.long_entry | signals.short_entry)
+    long_exits = np.flatnonzero(signals.long_exit)
+    short_exits = np.flatnonzero(signals.short_exit)
+
+    trades = []
+    positions = np.zeros(len(candles), dtype=np.int8)
+    equity = np.full(len(candles), float(starting_balance))
+    balance = float(starting_balance)
+    i = start
+    while True:
+        k = np.searchsorted(entries, i)
+        if k == len(entries):
+            break
+        entry_index = entries[k]
+        side = 1 if signals.long_entry[entry_index] else -1
+        entry_price = closes[entry_index]
+        qty = utils.size_to_qty(balance, entry_price, precision=precision, fee_rate=fee_rate)
+        if qty == 0:
+            raise ValueError(f'qty cannot be 0 (balance: {balance}, price: {entry_price}).')
+
+        # exits are checked from the candle after the entry
+        exits = long_exits if side == 1 else short_exits
+        k = np.searchsorted(exits, entry_index + 1)
+        exit_index = exits[k] if k < len(exits) else len(candles) - 1
+        exit_price = closes[exit_index]
+
+        fee = fee_rate * qty * (entry_price + exit_price)
+        pnl = side * qty * (exit_price - entry_price) - fee
+        positions[entry_index:exit_index] = side
+        equity[entry_index:exit_index] = balance + side * qty * (closes[entry_index:exit_index] - entry_price) \
+            - fee_rate * qty * entry_price
+        balance += pnl
+        equity[exit_index:] = balance
+        trades.append({
+            'type': 'long' if side == 1 else 'short',
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'qty': qty,
+            'opened_at': candles[entry_index, 0],
+            'closed_at': candles[exit_index, 0],
+            'entry_index': int(entry_index),
+            'exit_index': int(exit_index),
+            'fee': fee,
+            'PNL': pnl,
+        })
+
+        if k == len(exits):
+            # closed because we reached the end of the candles
+            break
+        # a new position can be opened on the candle the previous one was closed
+        i = exit_index
+
+    return {
+        'trades': trades,
+        'positions': positions,
+        'equity': equity,
+        'net_profit': balance - starting_balance,
+        'total': len(trades),
+    }
+
+
+def resample(one_minute_candles, timeframe):
+    """
+    Builds the candles of `timeframe` from one minute candles. The first one
+    minute candle is expected to be the first minute of a `timeframe` candle.
+    """
+    minutes = jh.timeframe_to_one_minutes(timeframe)
+    size = len(one_minute_candles) // minutes * minutes
+    grouped = one_minute_candles[:size].reshape(-1, minutes, one_minute_candles.shape[1])
+    return np.column_stack([
+        grouped[:, 0, 0],
+        grouped[:, 0, 1],
+        grouped[:, -1, 2],
+        grouped[:, :, 3].max(axis=1),
+        grouped[:, :, 4].min(axis=1),
+        grouped[:, :, 5].sum(axis=1),
+    ])
+
+
+def parity_check(config, route, candles, warmup_candles, rtol=1e-9):
+    """
+    Backtests `route` with `jesse.research.backtest` and with the strategy's
+    `vectorized_signals`, and compares the trades. The arguments are the ones
+    of `jesse.research.backtest` for a single route. Returns both results and
+    raises a ValueError when the trades differ.
+    """
+    from jesse.research import backtest
+
+    key = jh.key(route['exchange'], route['symbol'])
+    event_driven = backtest(config, [route], [], candles, warmup_candles)
+
+    warmup = resample(warmup_candles[key]['candles'], route['timeframe'])
+    trading = resample(candles[key]['candles'], route['timeframe'])
+    all_candles = np.concatenate([warmup, trading])
+    strategy_class = jh.get_strategy_class(route['strategy'])
+    vectorized = simulate(
+        all_candles, strategy_class.vectorized_signals(all_candles), start=len(warmup),
+        starting_balance=config['starting_balance'], fee_rate=config['fee'],
+    )
+
+    expected = event_driven.get('trades', [])
+    if len(expected) != len(vectorized['trades']):
+        raise ValueError(
+            f'{len(vectorized["trades"])} vectorized trades but {len(expected)} event driven trades.'
+        )
+    for a, b in zip(expected, vectorized['trades']):
+        same = a['type'] == b['type'] and np.isclose(a['qty'], b['qty'], rtol=rtol) and np.allclose(
+            [a['entry_price'], a['exit_price']], [b['entry_price'], b['exit_price']], rtol=rtol
+        )
+        if not same:
+            raise ValueError(f'Trades differ: {a} (event driven) != {b} (vectorized)')
+
+    return event_driven, vectorized
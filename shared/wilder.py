@@ -0,0 +1,190 @@
+"""
+Streaming RSI, ATR and ADX (Wilder's smoothing).
+
+The values follow `jesse.indicators.rsi`/`atr`/`adx` with `sequential=True`,
+including the NaNs returned while there are not enough candles yet. Each
+indicator keeps its value at the last committed candle in `self.value`, so
+crossovers can be detected from `(self.value, update(...))` without keeping a
+series around.
+
+They replace non sequential calls (`ta.adx(self.candles, period)`), which
+only see the last 240 candles: the streaming values are those of the whole
+history. Wilder's smoothing converges slowly, so with long periods the two
+differ by more than rounding (enough to flip a threshold like MAGen's ADX
+gates), and trades can change.
+"""
+
+import numpy as np
+import jesse.indicators as ta
+
+from .streaming import StreamingIndicator, candle_source
+
+
+def wilder_step(previous, value, period):
+    return (previous * (period - 1) + value) / period
+
+
+def true_range(candle, previous_close):
+    high, low = candle[3], candle[4]
+    if previous_close is None:
+        return high - low
+    return max(high - low, abs(high - previous_close), abs(low - previous_close))
+
+
+class StreamingRSI(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.rsi`.
+    """
+
+    def __init__(self, period=14, source_type="close"):
+        super().__init__()
+        self.period = period
+        self.source_type = source_type
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        # previous source value, and the (seed sums of the) average gain and loss
+        self.state = (None, 0.0, 0.0)
+        self.value = np.nan
+
+    def step(self, candle):
+        """
+        Returns the state and the RSI after adding `candle` (the candle at index `self.count`).
+        """
+        previous, gain, loss = self.state
+        value = candle_source(candle, self.source_type)
+        if previous is None:
+            return (value, gain, loss), np.nan
+
+        change = value - previous
+        up, down = max(change, 0.0), max(-change, 0.0)
+        index = self.count
+        if index < self.period:
+            # seed: sum of the first `period` changes
+            gain, loss = gain + up, loss + down
+            return (value, gain, loss), np.nan
+        if index == self.period:
+            gain, loss = (gain + up) / self.period, (loss + down) / self.period
+        else:
+            gain, loss = wilder_step(gain, up, self.period), wilder_step(loss, down, self.period)
+
+        if loss == 0:
+            return (value, gain, loss), 100.0
+        return (value, gain, loss), 100 - 100 / (1 + gain / loss)
+
+    def push(self, candle):
+        self.state, self.value = self.step(candle)
+
+    def peek(self, candle):
+        return self.step(candle)[1]
+
+    def batch(self, candles):
+        return ta.rsi(candles, self.period, source_type=self.source_type, sequential=True)[-1]
+
+
+class StreamingATR(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.atr`.
+    """
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        # previous close and the (seed sum of the) average true range
+        self.state = (None, 0.0)
+        self.value = np.nan
+
+    def step(self, candle):
+        previous_close, average = self.state
+        tr = true_range(candle, previous_close)
+        index = self.count
+        if index < self.period - 1:
+            return (candle[2], average + tr), np.nan
+        if index == self.period - 1:
+            average = (average + tr) / self.period
+        else:
+            average = wilder_step(average, tr, self.period)
+        return (candle[2], average), average
+
+    def push(self, candle):
+        self.state, self.value = self.step(candle)
+
+    def peek(self, candle):
+        return self.step(candle)[1]
+
+    def batch(self, candles):
+        return ta.atr(candles, self.period, sequential=True)[-1]
+
+
+class StreamingADX(StreamingIndicator):
+    """
+    Streaming version of `jesse.indicators.adx`.
+
+    Like the batch version, the true range and directional movements are
+    summed over the first `period` changes and then smoothed, and the first
+    ADX (at index 2 * period) is the average of the DX values at indexes
+    period to 2 * period - 1.
+    """
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        # previous (high, low, close), smoothed TR, +DM and -DM, and the (seed sum of the) ADX
+        self.state = (None, 0.0, 0.0, 0.0, 0.0)
+        self.value = np.nan
+
+    def step(self, candle):
+        previous, tr_sum, plus_sum, minus_sum, adx = self.state
+        index = self.count
+        current = (candle[3], candle[4], candle[2])
+        if previous is None:
+            return (current, tr_sum, plus_sum, minus_sum, adx), np.nan
+
+        period = self.period
+        tr = true_range(candle, previous[2])
+        up, down = candle[3] - previous[0], previous[1] - candle[4]
+        plus_dm = up if up > down and up > 0 else 0.0
+        minus_dm = down if down > up and down > 0 else 0.0
+
+        if index <= period:
+            tr_sum, plus_sum, minus_sum = tr_sum + tr, plus_sum + plus_dm, minus_sum + minus_dm
+        else:
+            tr_sum = tr_sum - tr_sum / period + tr
+            plus_sum = plus_sum - plus_sum / period + plus_dm
+            minus_sum = minus_sum - minus_sum / period + minus_dm
+        if index < period:
+            return (current, tr_sum, plus_sum, minus_sum, adx), np.nan
+
+        # flat candles (no range at all) count as no trend, like the batch version
+        dx = 0.0
+        if tr_sum:
+            plus_di, minus_di = 100 * plus_sum / tr_sum, 100 * minus_sum / tr_sum
+            if plus_di + minus_di:
+                dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
+
+        value = np.nan
+        if index < 2 * period:
+            adx += dx
+        elif index == 2 * period:
+            adx = value = adx / period
+        else:
+            adx = value = wilder_step(adx, dx, period)
+        return (current, tr_sum, plus_sum, minus_sum, adx), value
+
+    def push(self, candle):
+        self.state, self.value = self.step(candle)
+
+    def peek(self, candle):
+        return self.step(candle)[1]
+
+    def batch(self, candles):
+        return ta.adx(candles, self.period, sequential=True)[-1]
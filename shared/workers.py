@@ -0,0 +1,192 @@
+"""
+Candle arrays shared by the worker processes of an optimization.
+
+A process pool pickles the arguments of every task, so passing the candles
+to the workers copies the whole history into each of them (and again for
+every task). Here the candles are copied once into shared memory, or mapped
+from a .npy file, and the workers only receive small handles: reading a
+handle's `array` attaches a read-only view of the same memory, once per
+process.
+
+Usage:
+    from shared import workers
+    results = workers.backtest_many(config, routes, data_routes, candles, warmup_candles,
+                                    [{'adx_period': 14, ...}, ...], max_workers=8)
+
+`backtest_many` runs `jesse.research.backtest` once per hyperparameters dict
+with the candles shared between the workers. Jesse still copies the candles
+of a backtest into its own store; what is saved are the copies of the whole
+history that every task and every worker would get otherwise. The
+evaluators of this repository that work on the candle arrays directly (like
+DUAL_THRUST/population.py) read the shared views without any copy.
+
+With `cache_directory`, backtests that already ran (see shared/run_cache.py)
+are not run again.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# views this process attached to, by shared memory name or file path
+_attached = {}
+
+
+class SharedCandles:
+    """
+    Picklable handle to a read-only candle array in shared memory or in a
+    .npy file mapped in memory. Only the process that created the array
+    should release it, once the workers are done with it.
+    """
+
+    def __init__(self, name, shape, dtype='<f8', path=None):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+        self.path = path
+        # the shared memory block, only kept by the process that created it
+        self.memory = None
+
+    @classmethod
+    def create(cls, candles):
+        """
+        Copies `candles` into a new block of shared memory.
+        """
+        candles = np.ascontiguousarray(candles, dtype=np.float64)
+        memory = shared_memory.SharedMemory(create=True, size=max(candles.nbytes, 1))
+        np.ndarray(candles.shape, candles.dtype, buffer=memory.buf)[:] = candles
+        shared = cls(memory.name, candles.shape, candles.dtype)
+        shared.memory = memory
+        return shared
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Maps a .npy file of candles (see `numpy.save`) instead of copying it.
+        """
+        array = np.load(path, mmap_mode='r')
+        return cls(None, array.shape, array.dtype, path=os.path.abspath(path))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['memory'] = None
+        return state
+
+    @property
+    def key(self):
+        return self.path or self.name
+
+    @property
+    def array(self):
+        attached = _attached.get(self.key)
+        if attached is None:
+            if self.path:
+                attached = None, np.load(self.path, mmap_mode='r')
+            else:
+                memory = shared_memory.SharedMemory(name=self.name)
+                array = np.ndarray(self.shape, np.dtype(self.dtype), buffer=memory.buf)
+                array.flags.writeable = False
+                # the block has to stay open as long as the view is used
+                attached = memory, array
+            _attached[self.key] = attached
+        return attached[1]
+
+    def release(self):
+        """
+        Frees the shared memory. The memory is returned to the system once
+        every process that attached to it has exited or dropped its view.
+        """
+        _attached.pop(self.key, None)
+        if self.memory is not None:
+            self.memory.unlink()
+            self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def share(candles):
+    """
+    Same as `candles` (Jesse's dict of exchange-symbol key -> {'exchange',
+    'symbol', 'candles'}) with the arrays replaced by SharedCandles handles.
+    """
+    return {key: {**value, 'candles': SharedCandles.create(value['candles'])} for key, value in candles.items()}
+
+
+def attach(candles):
+    """
+    Inverse of `share`: the dict with read-only views of the shared arrays.
+    """
+    return {key: {**value, 'candles': value['candles'].array} for key, value in candles.items()}
+
+
+def release(candles):
+    for value in candles.values():
+        value['candles'].release()
+
+
+def _backtest(config, routes, data_routes, candles, warmup_candles, hyperparameters, kwargs):
+    from jesse.research import backtest
+
+    return backtest(config, routes, data_routes, attach(candles), attach(warmup_candles) if warmup_candles else None,
+                    hyperparameters=hyperparameters, **kwargs)
+
+
+def backtest_many(config, routes, data_routes, candles, warmup_candles, hyperparameters, max_workers=None,
+                  mp_context=None, cache_directory=None, return_exceptions=False, **kwargs):
+    """
+    Runs `jesse.research.backtest` for every dict of `hyperparameters` in a
+    process pool, with the candles in shared memory. The other arguments are
+    the ones of `jesse.research.backtest`. Returns the results in the order
+    of `hyperparameters`.
+
+    With `cache_directory`, results go through the run cache of
+    shared/run_cache.py: backtests that already ran are not run again, and
+    the duplicates of the list run once.
+
+    With `return_exceptions`, a backtest that raises gives its exception in
+    place of its result instead of stopping the others.
+    """
+    keys = list(range(len(hyperparameters)))
+    results = {}
+    if cache_directory:
+        from . import run_cache
+
+        dataset = run_cache.fingerprint(candles, warmup_candles)
+        keys = [run_cache.run_key(config, routes, data_routes, hp, dataset, kwargs) for hp in hyperparameters]
+        for key in set(keys):
+            result = run_cache.load(key, cache_directory)
+            if result is not None:
+                results[key] = result
+    # the first hyperparameters of each backtest left to run
+    pending = {}
+    for key, hp in zip(keys, hyperparameters):
+        if key not in results:
+            pending.setdefault(key, hp)
+
+    if pending:
+        shared_candles = share(candles)
+        shared_warmup = share(warmup_candles) if warmup_candles else None
+        try:
+            with ProcessPoolExecutor(max_workers, mp_context=mp_context) as pool:
+                futures = {
+                    key: pool.submit(_backtest, config, routes, data_routes, shared_candles, shared_warmup, hp, kwargs)
+                    for key, hp in pending.items()
+                }
+                for key, future in futures.items():
+                    if return_exceptions and future.exception() is not None:
+                        results[key] = future.exception()
+                        continue
+                    results[key] = future.result()
+                    if cache_directory:
+                        run_cache.store(key, results[key], cache_directory)
+        finally:
+            release(shared_candles)
+            if shared_warmup:
+                release(shared_warmup)
+    return [results[key] for key in keys]